@@ -1,25 +1,167 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, g, jsonify, Response, stream_with_context, abort
 import pymysql
-import os
 import io
-import csv
+import os
+import time
 from dotenv import load_dotenv
-from werkzeug.security import generate_password_hash, check_password_hash
+from db_pool import pool_from_env
+from catalog_cache import CatalogCache, DEFAULT_SORT, PRICE_RANGES, SORTS as CATALOG_SORTS
+from checkout import CheckoutError, OutOfStock, find_order_by_token, new_checkout_token, place_order, valid_checkout_token
+import cart as cart_store
+import session_store
+import reservations
+from orders import attach_order_details, fetch_orders_page, page_size, set_order_status
+from time_window import db_today, window_from_args, RANGES as TIME_RANGES
+from kpis import KPIService
+from reports import stream_orders_csv
+from pdf_reports import PDFReportCache, ReportBusy, data_version, fetch_report_rows
+from images import pick_image
+from passwords import ServiceBusy, service_from_env as password_service_from_env
+from audit_log import logger_from_env as audit_logger_from_env
+from search import ProductSearch
+from transactions import TransactionConflict, runner_from_env as transaction_runner_from_env
+from metrics import registry_from_env as metrics_registry_from_env
+from query_stats import DB_TIME_BUCKETS_MS, monitor_from_env as query_monitor_from_env
+from product_import import FORMATS as IMPORT_FORMATS, detect_format as detect_import_format, import_products, stream_products
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = 'canelitos_secret_key'
 
+db_pool = pool_from_env()
+
+# Sesiones del lado del servidor con SESSION_BACKEND=sqlite|mysql|memory; por defecto la cookie firmada de Flask
+_session_interface = session_store.session_interface_from_env(db_pool)
+if _session_interface is not None:
+    app.session_interface = _session_interface
+
+# Cuenta y cronometra las consultas de cada petición (Server-Timing, /admin/queries)
+query_monitor = query_monitor_from_env()
+
 def get_db():
-    return pymysql.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', ''),
-        database=os.getenv('MYSQL_DB', 'tienda_canelitos'),
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    # Una sola conexión del pool por petición; se devuelve en el teardown
+    if 'db' not in g:
+        conn = db_pool.acquire()
+        queries = g.get('queries')
+        g.db = query_monitor.wrap(conn, queries) if queries is not None else conn
+    return g.db
+
+catalog = CatalogCache(get_db,
+                       ttl=int(os.getenv('CATALOG_CACHE_TTL', '30')),
+                       max_items=int(os.getenv('CATALOG_CACHE_SIZE', '2048')))
+
+pdf_cache = PDFReportCache(os.getenv('PDF_CACHE_DIR', os.path.join('instance', 'pdf_cache')),
+                           timeout=int(os.getenv('PDF_TIMEOUT', '60')),
+                           max_workers=int(os.getenv('PDF_WORKERS', '2')),
+                           max_pending=int(os.getenv('PDF_MAX_PENDING', '4')))
+
+product_search = ProductSearch(get_db, db_pool, rebuild_interval=int(os.getenv('SEARCH_REBUILD_INTERVAL', '300')))
+
+passwords = password_service_from_env()
+
+login_audit = audit_logger_from_env(db_pool)
+
+kpi_service = KPIService(get_db, ttl=int(os.getenv('KPI_CACHE_TTL', '15')))
+
+# Transacciones de escritura con reintento ante deadlock / lock wait timeout
+tx = transaction_runner_from_env(get_db)
+
+# Segundos que el carrito aparta el stock desde el último producto agregado
+RESERVATION_TTL = int(os.getenv('RESERVATION_TTL', '900'))
+reservation_sweeper = reservations.sweeper_from_env(db_pool)
+
+@app.before_request
+def start_reservation_sweeper():
+    reservation_sweeper.ensure_started()
+
+# === MÉTRICAS (/metrics) ===
+metrics = metrics_registry_from_env()
+http_requests = metrics.counter('http_requests_total', 'Peticiones HTTP atendidas',
+                                ('route', 'method', 'status'))
+http_latency = metrics.histogram('http_request_duration_seconds', 'Latencia de las peticiones HTTP',
+                                 ('route', 'method'))
+http_in_flight = metrics.gauge('http_requests_in_flight', 'Peticiones HTTP en curso')
+checkouts = metrics.counter('checkouts_total', 'Compras por resultado', ('result',))
+stock_failures = metrics.counter('stock_failures_total', 'Rechazos por falta de stock', ('stage',))
+logins = metrics.counter('logins_total', 'Intentos de login por resultado', ('result',))
+cache_requests = metrics.counter('cache_requests_total', 'Consultas a cachés en memoria',
+                                 ('cache', 'result'))
+pool_connections = metrics.gauge('db_pool_connections', 'Conexiones del pool por estado', ('state',))
+pool_events = metrics.counter('db_pool_events_total', 'Eventos del pool de conexiones', ('event',))
+tx_retries = metrics.counter('db_transaction_retries_total', 'Reintentos de transacciones',
+                             ('reason',))
+tx_conflicts = metrics.counter('db_transaction_conflicts_total',
+                               'Transacciones abortadas tras agotar los reintentos')
+
+@metrics.collect
+def collect_component_metrics():
+    catalog_stats = catalog.stats()
+    cache_requests.set_total(catalog_stats['hits'], cache='catalog', result='hit')
+    cache_requests.set_total(catalog_stats['misses'], cache='catalog', result='miss')
+    pool_stats = db_pool.stats()
+    for state in ('open', 'idle', 'in_use'):
+        pool_connections.set(pool_stats[state], state=state)
+    for event in ('created', 'borrowed', 'recycled', 'ping_failures', 'timeouts', 'waits'):
+        pool_events.set_total(pool_stats[event], event=event)
+    tx_stats = tx.stats()
+    for reason, count in tx_stats['retries'].items():
+        tx_retries.set_total(count, reason=reason)
+    tx_conflicts.set_total(tx_stats['conflicts'])
+
+@app.before_request
+def start_request_metrics():
+    metrics.ensure_started()
+    http_in_flight.inc()
+    g.in_flight = True
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'sin ruta'
+    http_requests.inc(route=route, method=request.method, status=response.status_code)
+    if 'request_started' in g:
+        http_latency.observe(time.perf_counter() - g.request_started,
+                             route=route, method=request.method)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if g.pop('in_flight', False):
+        http_in_flight.dec()
+
+@app.before_request
+def start_query_stats():
+    g.request_started = time.perf_counter()
+    g.queries = query_monitor.start_request()
+
+@app.after_request
+def finish_query_stats(response):
+    queries = g.pop('queries', None)
+    if queries is not None:
+        route = request.url_rule.rule if request.url_rule else 'sin ruta'
+        elapsed = time.perf_counter() - g.request_started
+        response.headers['Server-Timing'] = query_monitor.finish_request(route, queries, elapsed)
+    return response
+
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.release()
+
+@app.context_processor
+def inject_cart_count():
+    return {'cart_count': cart_store.item_count(session)}
+
+@app.context_processor
+def inject_time_ranges():
+    return {'time_ranges': TIME_RANGES}
+
+def request_window():
+    # "Hoy" según el reloj de MySQL, el mismo de created_at, no el del servidor de la app
+    with get_db().cursor() as cur:
+        today = db_today(cur)
+    return window_from_args(request.args, today=today)
 
 def require_role(*roles):
     def wrapper(f):
@@ -32,6 +174,14 @@ def require_role(*roles):
         return decorated_function
     return wrapper
 
+def page_args():
+    # Parámetros de paginación por cursor: ?cursor=...&dir=next|prev&per_page=N
+    return {
+        'cursor': request.args.get('cursor'),
+        'direction': request.args.get('dir', 'next'),
+        'per_page': page_size(request.args.get('per_page')),
+    }
+
 # === LOGIN ===
 @app.route('/')
 def index():
@@ -63,7 +213,7 @@ def register():
                     return render_template('register.html')
                     
                 # Crear nuevo usuario como cliente
-                hashed_password = generate_password_hash(password)
+                hashed_password = passwords.hash(password)
                 cur.execute("""
                     INSERT INTO users (username, name, password, email, role, active, created_at)
                     VALUES (%s, %s, %s, %s, 'client', 1, NOW())
@@ -71,6 +221,10 @@ def register():
             conn.commit()
             flash('Cuenta creada exitosamente')
             return redirect(url_for('login'))
+        except ServiceBusy:
+            conn.rollback()
+            flash('El servidor está ocupado, intenta de nuevo en unos segundos')
+            return render_template('register.html'), 503
         except Exception as e:
             print("Error en registro:", str(e))
             flash('Error al crear la cuenta')
@@ -104,29 +258,52 @@ def login():
                 """, (user,))
                 u = cur.fetchone()
                 
-                if u and check_password_hash(u['password'], pwd):
-                    # Usuario existe y está activo
+                if u and passwords.verify(u['password'], pwd):
+                    # Actualizar hashes con parámetros viejos ahora que tenemos la contraseña.
+                    # Es opcional: si el pool de hash está ocupado se intenta en el próximo login
+                    try:
+                        if passwords.needs_rehash(u['password']):
+                            cur.execute("UPDATE users SET password = %s WHERE id = %s",
+                                        (passwords.hash(pwd), u['id']))
+                            conn.commit()
+                    except Exception as e:
+                        print("Error actualizando hash de contraseña:", str(e))
+                        conn.rollback()
+
+                    # Registrar el login exitoso (se inserta en lote en segundo plano);
+                    # si el spool falla el login sigue, como con el rehash
+                    try:
+                        login_audit.record(u['id'])
+                    except Exception as e:
+                        print("Error registrando login:", str(e))
+
+                    # Usuario existe y está activo; la sesión se llena solo al final
                     session.clear()
+                    session_store.regenerate(session)
                     session['user_id'] = u['id']
                     session['user'] = u['username']
                     session['user_name'] = u['name']
                     session['user_role'] = u.get('role', 'client')
                     session['user_email'] = u.get('email')
-                    session['cart'] = []  # Inicializar carrito vacío
-
-                    # Registrar el login exitoso
-                    cur.execute("""
-                        INSERT INTO login_history (user_id, login_date)
-                        VALUES (%s, NOW())
-                    """, (u['id'],))
-                    conn.commit()
+                    if session['user_role'] == 'client':
+                        # Reservas de un carrito anterior que ya no existe
+                        release_reservations()
+                    session['cart'] = {}  # Inicializar carrito vacío
+                    logins.inc(result='ok')
 
                     # Redirigir a home (que ya maneja la redirección por rol)
                     return redirect(url_for('home'))
 
+            logins.inc(result='invalid')
             flash("Usuario o contraseña incorrectos")
             return render_template('login.html')
+        except ServiceBusy:
+            logins.inc(result='busy')
+            conn.rollback()
+            flash("El servidor está ocupado, intenta de nuevo en unos segundos")
+            return render_template('login.html'), 503
         except Exception as e:
+            logins.inc(result='error')
             print("Error en login:", str(e))
             flash("Error al iniciar sesión. Por favor, intenta de nuevo.")
             conn.rollback()
@@ -138,6 +315,8 @@ def login():
     return render_template('login.html')
 
 # === HOME (redirige por rol) ===
+CATALOG_PAGE_SIZE = 24
+
 @app.route('/home')
 def home():
     if 'user_role' not in session:
@@ -152,82 +331,123 @@ def home():
     elif role == 'delivery':
         return redirect(url_for('delivery_orders'))
     
-    # Para clientes, mostrar productos
-    conn = get_db()
+    # Para clientes, mostrar la página del catálogo pedida:
+    # ?category=...&price=0-5|5-10|10-25|25-&sort=category|name|price_asc|price_desc&page=N
+    category = request.args.get('category') or None
+    price_range = request.args.get('price') if request.args.get('price') in PRICE_RANGES else None
+    sort = request.args.get('sort') if request.args.get('sort') in CATALOG_SORTS else DEFAULT_SORT
+    page = max(request.args.get('page', 1, type=int), 1)
+    filters = {'category': category, 'price': price_range, 'sort': sort}
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, name, price, category, stock, image 
-                FROM products 
-                WHERE stock > 0
-                ORDER BY category, name
-            """)
-            products = cur.fetchall()
-            
-            # Asegurar que image tenga un valor válido
-            for p in products:
-                if not p.get('image'):
-                    p['image'] = 'placeholder.svg'
-                    
-        return render_template('home.html', 
-                             products=products,
-                             user=session.get('user'),
-                             user_name=session.get('user_name'))
+        products, total = catalog.browse(category, price_range, sort,
+                                         page=page, per_page=CATALOG_PAGE_SIZE)
+        facets = catalog.facets(category, price_range)
     except Exception as e:
         print("Error en home:", str(e))
         flash("Error al cargar productos")
-        return render_template('home.html', products=[])
-    finally:
-        conn.close()
+        return render_template('home.html', products=[], facets=None, filters=filters,
+                               sorts=CATALOG_SORTS, total=0, page=1, pages=0)
+    pages = (total + CATALOG_PAGE_SIZE - 1) // CATALOG_PAGE_SIZE
+    return render_template('home.html',
+                           products=products,
+                           facets=facets,
+                           filters=filters,
+                           sorts=CATALOG_SORTS,
+                           total=total,
+                           page=page,
+                           pages=pages,
+                           user=session.get('user'),
+                           user_name=session.get('user_name'))
 
 # === CLIENTE: PRODUCTOS Y CARRITO ===
 @app.route('/product/<int:pid>')
 @require_role('client')
 def product_detail(pid):
-    conn = get_db()
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM products WHERE id = %s", (pid,))
-        product = cur.fetchone()
-    conn.close()
+    product = catalog.get_product(pid)
     if not product:
         flash("Producto no encontrado")
         return redirect(url_for('home'))
     return render_template('product_detail.html', product=product)
 
+SEARCH_PAGE_SIZE = 24
+
+@app.route('/search')
+@require_role('client')
+def search():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    products, total = [], 0
+    if query:
+        try:
+            ids, total = product_search.search(query, page=page, per_page=SEARCH_PAGE_SIZE)
+            products = catalog.get_products(ids)
+        except Exception as e:
+            print("Error en búsqueda:", str(e))
+            flash("La búsqueda no está disponible en este momento, intenta de nuevo")
+            products, total = [], 0
+    pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+    return render_template('search.html', query=query, products=products,
+                           total=total, page=page, pages=pages)
+
 @app.route('/add_to_cart/<int:pid>')
 @require_role('client')
 def add_to_cart(pid):
-    conn = get_db()
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM products WHERE id = %s AND stock > 0", (pid,))
-        p = cur.fetchone()
-    conn.close()
-    if p:
-        session.setdefault('cart', []).append({'id': p['id'], 'name': p['name'], 'price': float(p['price'])})
-        session.modified = True
+    p = catalog.get_product(pid)
+    if not p:
+        flash("Producto no encontrado")
+        return redirect(url_for('home'))
+    try:
+        cart_store.check_add(cart_store.load_cart(session), pid)
+    except cart_store.CartFullError as e:
+        flash(str(e))
+        return redirect(url_for('cart'))
+
+    # Apartar la unidad ahora; el stock en caché puede estar desactualizado
+    try:
+        tx.run(reservations.reserve, session['user_id'], pid, 1, ttl=RESERVATION_TTL)
+    except reservations.ReservationError as e:
+        stock_failures.inc(stage='cart')
+        flash(str(e))
+        return redirect(url_for('cart'))
+    except Exception as e:
+        print("Error reservando producto:", str(e))
+        flash("No se pudo agregar el producto")
+        return redirect(url_for('cart'))
+    cart_store.add_item(session, pid)
     return redirect(url_for('cart'))
 
+def release_reservations(product_ids=None):
+    try:
+        tx.run(reservations.release, session['user_id'], product_ids)
+    except Exception as e:
+        # Si falla, el barrido las libera al vencer
+        print("Error liberando reservas:", str(e))
+
 @app.route('/cart')
 @require_role('client')
 def cart():
-    items = session.get('cart', [])
-    total = sum(item['price'] for item in items)
-    return render_template('cart.html', cart=items, total=total)
-
-@app.route('/cart/remove/<int:index>', methods=['POST'])
+    items, total, removed = cart_store.resolve_cart(cart_store.load_cart(session), catalog)
+    if removed:
+        for pid in removed:
+            cart_store.remove_item(session, pid)
+        release_reservations(removed)
+        flash("Se quitaron del carrito productos que ya no están disponibles")
+    return render_template('cart.html', cart=items, total=total,
+                           reservation_minutes=RESERVATION_TTL // 60,
+                           checkout_token=new_checkout_token())
+
+@app.route('/cart/remove/<int:pid>', methods=['POST'])
 @require_role('client')
-def cart_remove(index):
-    cart = session.get('cart', [])
-    if 0 <= index < len(cart):
-        cart.pop(index)
-        session['cart'] = cart
-        session.modified = True
+def cart_remove(pid):
+    cart_store.remove_item(session, pid)
+    release_reservations([pid])
     return redirect(url_for('cart'))
 
 @app.route('/cart/clear', methods=['POST'])
 @require_role('client')
 def cart_clear():
-    session['cart'] = []
+    session['cart'] = {}
+    release_reservations()
     return redirect(url_for('cart'))
 
 @app.route('/checkout', methods=['POST'])
@@ -237,9 +457,19 @@ def checkout():
         flash("Por favor inicia sesión para completar la compra")
         return redirect(url_for('login'))
         
-    cart = session.get('cart', [])
+    cart = cart_store.load_cart(session)
     method = request.form.get('payment_method')
     delivery_address = request.form.get('delivery_address', '').strip()
+    token = valid_checkout_token(request.form.get('checkout_token'))
+
+    conn = get_db()
+    if token:
+        # Reenvío del mismo formulario: responder con la orden ya creada
+        with conn.cursor() as cur:
+            existing = find_order_by_token(cur, session['user_id'], token)
+        if existing:
+            checkouts.inc(result='duplicate')
+            return checkout_done(existing[0])
     
     if not cart:
         flash("El carrito está vacío")
@@ -250,104 +480,66 @@ def checkout():
     if not delivery_address:
         flash("Por favor ingresa una dirección de entrega")
         return redirect(url_for('cart'))
+    # Cobrar solo los precios que el cliente vio en el carrito
+    expected_prices = cart_store.posted_prices(request.form, cart)
+    if set(expected_prices) != set(cart):
+        flash("Tu carrito cambió; revisa el total antes de confirmar")
+        return redirect(url_for('cart'))
     
-    conn = get_db()
     try:
-        with conn.cursor() as cur:
-            # Calcular total final
-            total_order = sum(item['price'] for item in cart)
-            
-            # Crear orden maestra
-            cur.execute("""
-                INSERT INTO orders_master (
-                    user_id, total_amount, payment_method, 
-                    delivery_address, status, created_at
-                )
-                VALUES (%s, %s, %s, %s, 'Pendiente', NOW())
-            """, (session['user_id'], total_order, method, delivery_address))
-            master_id = cur.lastrowid
-            
-            # Verificar y procesar cada item
-            items_processed = []
-            try:
-                for item in cart:
-                    # Verificar stock en tiempo real
-                    cur.execute("""
-                        SELECT id, name, stock, price 
-                        FROM products 
-                        WHERE id = %s
-                        FOR UPDATE
-                    """, (item['id'],))
-                    product = cur.fetchone()
-                    
-                    if not product:
-                        raise Exception(f"Producto {item['name']} no encontrado")
-                    if product['stock'] < 1:
-                        raise Exception(f"Producto {item['name']} sin stock")
-                    if abs(float(product['price']) - float(item['price'])) > 0.01:
-                        raise Exception(f"El precio de {item['name']} ha cambiado")
-                    
-                    # Insertar detalle de orden
-                    cur.execute("""
-                        INSERT INTO order_details (
-                            order_id, product_id, quantity, 
-                            unit_price, total_price
-                        )
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (master_id, item['id'], 1, 
-                         product['price'], product['price']))
-                    
-                    # Actualizar stock
-                    cur.execute("""
-                        UPDATE products 
-                        SET stock = stock - 1,
-                            updated_at = NOW()
-                        WHERE id = %s AND stock > 0
-                    """, (item['id'],))
-                    
-                    if cur.rowcount == 0:
-                        raise Exception(f"No se pudo actualizar stock de {item['name']}")
-                    
-                    items_processed.append(item['id'])
-                
-                # Todo ok - confirmar transacción
-                conn.commit()
-                session['cart'] = []
-                flash("¡Compra confirmada! Gracias por tu pedido.")
-                
-            except Exception as e:
-                # Si algo falla, revertir cambios en los items procesados
-                for pid in items_processed:
-                    cur.execute("""
-                        UPDATE products 
-                        SET stock = stock + 1
-                        WHERE id = %s
-                    """, (pid,))
-                raise e
-                
+        order_id, _ = tx.run(place_order, session['user_id'], cart, method, delivery_address,
+                             expected_prices=expected_prices, checkout_token=token)
+        catalog.invalidate(cart)
+    except OutOfStock as e:
+        checkouts.inc(result='out_of_stock')
+        stock_failures.inc(stage='checkout')
+        flash(str(e))
+        return redirect(url_for('cart'))
+    except CheckoutError as e:
+        checkouts.inc(result='rejected')
+        # Un precio cambiado puede seguir en la caché: que el carrito muestre el actual
+        catalog.invalidate(cart)
+        flash(str(e))
+        return redirect(url_for('cart'))
+    except TransactionConflict as e:
+        checkouts.inc(result='conflict')
+        print("Error en checkout:", str(e))
+        flash("Hay mucha demanda en este momento, intenta confirmar de nuevo")
+        return redirect(url_for('cart'))
+    except pymysql.err.IntegrityError as e:
+        existing = None
+        if token and e.args and e.args[0] == 1062:
+            # Un envío simultáneo con el mismo token confirmó primero
+            with conn.cursor() as cur:
+                existing = find_order_by_token(cur, session['user_id'], token)
+        if existing:
+            checkouts.inc(result='duplicate')
+            return checkout_done(existing[0])
+        checkouts.inc(result='error')
+        print("Error en checkout:", str(e))
+        flash("No se pudo confirmar la compra")
+        return redirect(url_for('cart'))
     except Exception as e:
+        checkouts.inc(result='error')
         print("Error en checkout:", str(e))
-        conn.rollback()
-        flash(str(e))
+        flash("No se pudo confirmar la compra")
         return redirect(url_for('cart'))
-    finally:
-        conn.close()
+    checkouts.inc(result='ok')
+    return checkout_done(order_id)
+
+def checkout_done(order_id):
+    session['cart'] = {}
+    flash(f"¡Compra confirmada! Gracias por tu pedido #{order_id}.")
     return redirect(url_for('home'))
 
 # === ADMIN ===
 @app.route('/admin')
 @require_role('admin')
 def admin_dashboard():
-    conn = get_db()
-    with conn.cursor() as cur:
-        cur.execute("SELECT COALESCE(SUM(total_amount), 0) AS ventas FROM orders_master WHERE DATE(created_at) = CURDATE()")
-        ventas = cur.fetchone()['ventas']
-        cur.execute("SELECT COUNT(*) AS tickets FROM orders_master WHERE DATE(created_at) = CURDATE()")
-        tickets = cur.fetchone()['tickets']
-        cur.execute("SELECT COUNT(*) AS empleados FROM users WHERE role IN ('seller','delivery') AND active = 1")
-        empleados = cur.fetchone()['empleados']
-    conn.close()
-    return render_template('admin/dashboard.html', ventas=ventas, tickets=tickets, empleados=empleados)
+    window = request_window()
+    kpis = kpi_service.summary(window)
+    return render_template('admin/dashboard.html', ventas=kpis['ventas'], tickets=kpis['tickets'],
+                           empleados=kpis['empleados'], kpis=kpis, window=window)
 
 @app.route('/admin/users')
 @require_role('admin')
@@ -370,10 +562,14 @@ def admin_create_user():
         if role not in ['client', 'seller', 'delivery']:
             flash("Rol inválido.")
             return redirect(url_for('admin_create_user'))
+        try:
+            hashed_password = passwords.hash(password)
+        except ServiceBusy:
+            flash("El servidor está ocupado, intenta de nuevo.")
+            return redirect(url_for('admin_create_user'))
         conn = get_db()
         try:
             with conn.cursor() as cur:
-                hashed_password = generate_password_hash(password)
                 cur.execute("INSERT INTO users (username, name, password, role) VALUES (%s, %s, %s, %s)",
                            (username, name, hashed_password, role))
             conn.commit()
@@ -390,7 +586,17 @@ def admin_create_user():
 def admin_products():
     conn = get_db()
     with conn.cursor() as cur:
-        cur.execute("SELECT * FROM products")
+        # products.stock es el disponible; el inventario muestra lo que hay en bodega
+        cur.execute("""
+            SELECT p.*, CAST(COALESCE(h.held, 0) AS SIGNED) AS reserved,
+                   CAST(p.stock + COALESCE(h.held, 0) AS SIGNED) AS on_hand
+            FROM products p
+            LEFT JOIN (
+                SELECT product_id, SUM(quantity) AS held
+                FROM reservations
+                GROUP BY product_id
+            ) h ON h.product_id = p.id
+        """)
         products = cur.fetchall()
     conn.close()
     return render_template('admin/products.html', products=products)
@@ -403,14 +609,24 @@ def admin_create_product():
         price = request.form['price']
         category = request.form['category']
         stock = request.form['stock']
+        sku = request.form.get('sku', '').strip() or None
         conn = get_db()
         try:
             with conn.cursor() as cur:
                 cur.execute("""
-                    INSERT INTO products (name, price, category, stock, image)
-                    VALUES (%s, %s, %s, %s, 'placeholder.svg')
-                """, (name, price, category, stock))
+                    INSERT INTO products (sku, name, price, category, stock, image)
+                    VALUES (%s, %s, %s, %s, %s, 'placeholder.svg')
+                """, (sku, name, price, category, stock))
+                # lastrowid vuelve a 0 después del UPDATE del sku
+                product_id = cur.lastrowid
+                if not sku:
+                    # Sin SKU del proveedor: se deriva del id, como en migrations/005
+                    cur.execute("""
+                        UPDATE products SET sku = CONCAT('P', LPAD(id, 6, '0')) WHERE id = %s
+                    """, (product_id,))
             conn.commit()
+            catalog.invalidate([product_id])
+            product_search.upsert({'id': product_id, 'name': name, 'category': category})
             flash("Producto creado.")
             return redirect(url_for('admin_products'))
         except Exception as e:
@@ -419,70 +635,141 @@ def admin_create_product():
             conn.close()
     return render_template('admin/create_product.html')
 
+@app.route('/admin/products/import', methods=['GET', 'POST'])
+@require_role('admin', 'seller')
+def admin_import_products():
+    summary = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash("Selecciona un archivo CSV o JSONL")
+            return redirect(url_for('admin_import_products'))
+        fmt = request.form.get('format') or detect_import_format(upload.filename)
+        if fmt not in IMPORT_FORMATS:
+            fmt = 'csv'
+        conn = get_db()
+        try:
+            stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+            summary = import_products(conn, stream, fmt)
+        except Exception as e:
+            print("Error importando productos:", str(e))
+            conn.rollback()
+            flash("Error al importar productos")
+        finally:
+            # Aunque falle, los lotes anteriores al error ya quedaron confirmados
+            catalog.invalidate()
+            product_search.invalidate()
+    return render_template('admin/import_products.html', summary=summary)
+
+@app.route('/admin/products/export')
+@require_role('admin', 'seller')
+def admin_export_products():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in IMPORT_FORMATS:
+        fmt = 'csv'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(stream_products(db_pool, fmt)),
+                    mimetype=f'{mimetype}; charset=utf-8',
+                    headers={'Content-Disposition': f'attachment; filename=productos.{fmt}'})
+
 @app.route('/admin/orders')
 @require_role('admin', 'seller', 'delivery')
 def admin_orders():
     conn = get_db()
     with conn.cursor() as cur:
-        cur.execute("""
+        page = fetch_orders_page(cur, """
             SELECT om.*, u.name as cliente
             FROM orders_master om
             JOIN users u ON om.user_id = u.id
-            ORDER BY om.created_at DESC
-        """)
-        orders = cur.fetchall()
+        """, **page_args())
     conn.close()
-    return render_template('admin/orders.html', orders=orders)
+    return render_template('admin/orders.html', orders=page['orders'], page=page)
 
 @app.route('/admin/orders/update/<int:oid>', methods=['POST'])
 @require_role('admin', 'seller', 'delivery')
 def update_order_status(oid):
     status = request.form['status']
-    conn = get_db()
-    with conn.cursor() as cur:
-        cur.execute("UPDATE orders_master SET status = %s WHERE id = %s", (status, oid))
-    conn.commit()
-    conn.close()
+    try:
+        if not tx.run(set_order_status, oid, status):
+            flash("Pedido no encontrado")
+    except TransactionConflict as e:
+        print("Error actualizando pedido:", str(e))
+        flash("El pedido está ocupado, intenta de nuevo")
+    except Exception as e:
+        print("Error actualizando pedido:", str(e))
+        flash("No se pudo actualizar el pedido")
     return redirect(url_for('admin_orders'))
 
 @app.route('/admin/report')
 @require_role('admin')
 def admin_report():
+    window = request_window()
+    statuses = request.args.getlist('status')
+    filename = f"reporte_ventas_{window.start:%Y%m%d}_{window.last_day:%Y%m%d}.csv"
+    return Response(stream_with_context(stream_orders_csv(db_pool, window, statuses)),
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/admin/report/pdf')
+@require_role('admin')
+def admin_report_pdf():
+    window = request_window()
+    statuses = request.args.getlist('status')
     conn = get_db()
-    with conn.cursor() as cur:
-        cur.execute("""
-            SELECT om.created_at, u.name as cliente, om.total_amount as total, om.payment_method
-            FROM orders_master om
-            JOIN users u ON om.user_id = u.id
-            WHERE DATE(om.created_at) = CURDATE()
-        """)
-        orders = cur.fetchall()
-    conn.close()
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Fecha', 'Cliente', 'Total', 'Método de Pago'])
-    for o in orders:
-        writer.writerow([o['created_at'], o['cliente'], o['total'], o['payment_method']])
-    output.seek(0)
+    def build_html():
+        with conn.cursor() as cur:
+            orders, truncated = fetch_report_rows(cur, window, statuses)
+        return render_template('report_orders.html', orders=orders, truncated=truncated,
+                               window=window, statuses=statuses)
 
-    mem = io.BytesIO()
-    mem.write(output.getvalue().encode('utf-8'))
-    mem.seek(0)
-    return send_file(mem, mimetype='text/csv', as_attachment=True, download_name='reporte_ventas.csv')
+    try:
+        with conn.cursor() as cur:
+            version = data_version(cur, window)
+        path = pdf_cache.get_or_render(window, statuses, version, build_html, request.url_root)
+    except ReportBusy:
+        flash("Hay demasiados reportes en proceso, intenta de nuevo en un momento")
+        return redirect(url_for('admin_dashboard', **window.as_args()))
+    except Exception as e:
+        print("Error en reporte PDF:", str(e))
+        flash("No se pudo generar el reporte PDF")
+        return redirect(url_for('admin_dashboard', **window.as_args()))
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f"reporte_pedidos_{window.start:%Y%m%d}_{window.last_day:%Y%m%d}.pdf")
+
+@app.route('/admin/pool')
+@require_role('admin')
+def admin_pool_stats():
+    stats = db_pool.stats()
+    stats['transactions'] = tx.stats()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Sin sesión para que lo lea Prometheus; METRICS_TOKEN exige "Authorization: Bearer <token>"
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(403)
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/admin/queries')
+@require_role('admin')
+def admin_query_stats():
+    return render_template('admin/queries.html',
+                           routes=query_monitor.routes(),
+                           slow_queries=query_monitor.slow_queries(),
+                           buckets=DB_TIME_BUCKETS_MS,
+                           slow_ms=query_monitor.slow_seconds * 1000,
+                           pid=os.getpid())
 
 # === VENDEDOR ===
 @app.route('/seller')
 @require_role('seller')
 def seller_dashboard():
-    conn = get_db()
-    with conn.cursor() as cur:
-        cur.execute("SELECT COALESCE(SUM(total_amount), 0) AS ventas FROM orders_master WHERE DATE(created_at) = CURDATE()")
-        ventas = cur.fetchone()['ventas']
-        cur.execute("SELECT COUNT(*) AS tickets FROM orders_master WHERE DATE(created_at) = CURDATE()")
-        tickets = cur.fetchone()['tickets']
-    conn.close()
-    return render_template('seller/dashboard.html', ventas=ventas, tickets=tickets)
+    window = request_window()
+    kpis = kpi_service.summary(window)
+    return render_template('seller/dashboard.html', ventas=kpis['ventas'], tickets=kpis['tickets'],
+                           kpis=kpis, window=window)
 
 # === REPARTIDOR ===
 @app.route('/delivery')
@@ -490,27 +777,15 @@ def seller_dashboard():
 def delivery_orders():
     conn = get_db()
     with conn.cursor() as cur:
-        cur.execute("""
+        page = fetch_orders_page(cur, """
             SELECT om.*, u.name as cliente
             FROM orders_master om
             JOIN users u ON om.user_id = u.id
-            WHERE om.status IN ('Pendiente', 'En camino')
-            ORDER BY om.created_at DESC
-        """)
-        orders = cur.fetchall()
-
-        # Obtener detalles de cada orden
-        for order in orders:
-            cur.execute("""
-                SELECT od.*, p.name as product_name
-                FROM order_details od
-                JOIN products p ON od.product_id = p.id
-                WHERE od.order_id = %s
-            """, (order['id'],))
-            order['details'] = cur.fetchall()
+        """, ["om.status IN ('Pendiente', 'En camino')"], **page_args())
+        orders = attach_order_details(cur, page['orders'])
 
     conn.close()
-    return render_template('delivery/orders.html', orders=orders)
+    return render_template('delivery/orders.html', orders=orders, page=page)
 
 # === PERFIL ===
 @app.route('/profile')
@@ -534,7 +809,7 @@ def profile():
                 return redirect(url_for('login'))
             
             # Obtener pedidos del usuario
-            cur.execute("""
+            page = fetch_orders_page(cur, """
                 SELECT om.*, 
                        CASE 
                            WHEN om.status = 'Pendiente' THEN 'warning'
@@ -545,24 +820,13 @@ def profile():
                            ELSE 'secondary'
                        END as status_color
                 FROM orders_master om
-                WHERE om.user_id = %s
-                ORDER BY om.created_at DESC
-            """, (session['user_id'],))
-            orders = cur.fetchall()
-            
-            # Obtener detalles de cada orden
-            for order in orders:
-                cur.execute("""
-                    SELECT od.*, p.name as product_name
-                    FROM order_details od
-                    JOIN products p ON od.product_id = p.id
-                    WHERE od.order_id = %s
-                """, (order['id'],))
-                order['details'] = cur.fetchall()
-                
+            """, ['om.user_id = %s'], [session['user_id']], **page_args())
+            orders = attach_order_details(cur, page['orders'])
+
         return render_template('profile.html',
                              user=user,
-                             orders=orders)
+                             orders=orders,
+                             page=page)
                              
     except Exception as e:
         print("Error en profile:", str(e))
@@ -620,15 +884,27 @@ def update_profile():
 
 @app.route('/logout')
 def logout():
+    # El carrito se pierde con la sesión: devolver ya lo que tenía apartado
+    if session.get('user_id') and session.get('user_role') == 'client':
+        release_reservations()
     session.clear()
     return redirect(url_for('login'))
 
 # === SERVICIO DE IMÁGENES ===
+IMG_MAX_AGE = int(os.getenv('IMG_MAX_AGE', str(7 * 24 * 3600)))
+
 @app.route('/img/<path:filename>')
 def img(filename):
     if '..' in filename:
         return "Invalid path", 400
-    return send_file(os.path.join('static', 'img', filename))
+    # ?size=thumb|medium|large elige una variante pregenerada; WebP si el navegador lo acepta
+    accept_webp = any(mime == 'image/webp' and q > 0 for mime, q in request.accept_mimetypes)
+    path = pick_image(filename, request.args.get('size'), accept_webp)
+    if not os.path.isfile(path):
+        abort(404)
+    response = send_file(path, max_age=IMG_MAX_AGE, conditional=True, etag=True)
+    response.vary.add('Accept')
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""Registro diferido (write-behind) de login_history.
+
+login() solo anota el evento en memoria y en un archivo de spool local; un
+hilo de fondo los inserta en lotes con un solo executemany cuando se junta
+batch_size eventos o pasan flush_interval segundos. El spool permite
+recuperar los eventos pendientes si el proceso muere: al arrancar, cada
+proceso adopta los spools de procesos que ya no existen.
+"""
+import atexit
+import glob
+import json
+import os
+import secrets
+import threading
+from datetime import datetime
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditLogger:
+
+    def __init__(self, pool, spool_dir, batch_size=100, flush_interval=2.0):
+        self.pool = pool
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self.flushed = 0
+        self.errors = 0
+
+    # --- spool ---
+
+    def _spool_path(self):
+        return os.path.join(self.spool_dir, f"login-{os.getpid()}.jsonl")
+
+    def _append_spool(self, event):
+        with open(self._spool_path(), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event) + '\n')
+
+    def _rewrite_spool(self, events):
+        path = self._spool_path()
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event) + '\n')
+        os.replace(tmp, path)
+
+    def _read_spool(self, path):
+        events = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        continue
+        return events
+
+    def _adopt_orphans(self):
+        """Carga el spool propio y los de procesos muertos; devuelve (eventos, archivos adoptados).
+
+        Cada spool huérfano se reclama primero renombrándolo a
+        adopt-<pid propio>-<sufijo>.jsonl: si dos workers arrancan a la vez solo uno
+        gana el rename y el otro lo salta. Los adoptados se borran después de
+        copiar sus eventos al spool propio.
+        """
+        events = []
+        adopted = []
+        own = self._spool_path()
+        if os.path.exists(own):
+            events.extend(self._read_spool(own))
+        patterns = ('login-*.jsonl', 'adopt-*.jsonl')
+        paths = [p for pattern in patterns for p in glob.glob(os.path.join(self.spool_dir, pattern))]
+        for path in paths:
+            if path == own:
+                continue
+            try:
+                # login-<pid>.jsonl o adopt-<pid>-<sufijo>.jsonl de quien lo reclamó
+                pid = int(os.path.basename(path)[:-len('.jsonl')].split('-')[1])
+            except (ValueError, IndexError):
+                continue
+            if pid == os.getpid():
+                # Adopción a medias de un proceso anterior con el mismo pid
+                adopted.append(path)
+                events.extend(self._read_spool(path))
+                continue
+            if _pid_alive(pid):
+                continue
+            claimed = os.path.join(self.spool_dir, f"adopt-{os.getpid()}-{secrets.token_hex(4)}.jsonl")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                # Otro proceso lo reclamó primero
+                continue
+            adopted.append(claimed)
+            events.extend(self._read_spool(claimed))
+        return events, adopted
+
+    # --- ciclo de vida ---
+
+    def _ensure_started(self):
+        # Se arranca en el primer uso de cada proceso (después del fork de gunicorn)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._pid = os.getpid()
+        self._pending, adopted = self._adopt_orphans()
+        self._rewrite_spool(self._pending)
+        for path in adopted:
+            os.remove(path)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+        self._thread.start()
+
+    def record(self, user_id, when=None):
+        event = {
+            'user_id': user_id,
+            'login_date': (when or datetime.now()).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with self._cond:
+            self._ensure_started()
+            self._append_spool(event)
+            self._pending.append(event)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+            flushed = self.flush()
+            with self._cond:
+                if self._stopping and not self._pending:
+                    return
+                if not flushed and self._pending and not self._stopping:
+                    # La escritura falló: esperar antes de reintentar
+                    self._cond.wait(self.flush_interval)
+
+    def flush(self):
+        """Inserta los eventos pendientes; si falla, quedan en el spool para reintentar."""
+        with self._cond:
+            batch = self._pending[:self.batch_size * 10]
+        if not batch:
+            return 0
+        try:
+            conn = self.pool.acquire()
+            try:
+                with conn.cursor() as cur:
+                    cur.executemany("""
+                        INSERT INTO login_history (user_id, login_date)
+                        VALUES (%s, %s)
+                    """, [(e['user_id'], e['login_date']) for e in batch])
+                conn.commit()
+            finally:
+                conn.release()
+        except Exception as e:
+            self.errors += 1
+            print("Error guardando login_history:", str(e))
+            if self._stopping:
+                # Sin reintentos al cerrar: el spool los conserva para el próximo arranque
+                with self._cond:
+                    self._pending = []
+            return 0
+
+        with self._cond:
+            del self._pending[:len(batch)]
+            self._rewrite_spool(self._pending)
+        self.flushed += len(batch)
+        return len(batch)
+
+    def close(self):
+        """Vacía la cola antes de terminar el proceso."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout=10)
+
+
+def logger_from_env(pool):
+    logger = AuditLogger(
+        pool,
+        spool_dir=os.getenv('AUDIT_SPOOL_DIR', os.path.join('instance', 'audit_spool')),
+        batch_size=int(os.getenv('AUDIT_BATCH_SIZE', '100')),
+        flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', '2')),
+    )
+    atexit.register(logger.close)
+    return logger
@@ -0,0 +1,103 @@
+"""Carrito compacto guardado en la sesión como {product_id: cantidad}.
+
+La cookie solo lleva ids y cantidades; nombres y precios se toman del
+catálogo al mostrar el carrito, así que su tamaño no crece con los clics.
+"""
+
+MAX_LINES = 50     # productos distintos por carrito
+MAX_QUANTITY = 99  # unidades por producto
+
+
+class CartFullError(Exception):
+    """El carrito alcanzó el límite de productos o unidades."""
+
+
+def load_cart(session):
+    """Devuelve el carrito como {int: int}, migrando el formato antiguo."""
+    raw = session.get('cart') or {}
+    cart = {}
+    if isinstance(raw, list):
+        # Formato anterior: una lista con un dict por cada clic
+        for item in raw:
+            pid = int(item['id'])
+            cart[pid] = cart.get(pid, 0) + 1
+    else:
+        for pid, qty in raw.items():
+            cart[int(pid)] = int(qty)
+    return cart
+
+
+def save_cart(session, cart):
+    # Las llaves JSON de la cookie siempre son cadenas
+    session['cart'] = {str(pid): qty for pid, qty in cart.items() if qty > 0}
+    session.modified = True
+
+
+def check_add(cart, pid, quantity=1, available=None):
+    """Lanza CartFullError si agregar quantity unidades excede los límites."""
+    if pid not in cart and len(cart) >= MAX_LINES:
+        raise CartFullError(f"El carrito admite como máximo {MAX_LINES} productos")
+    limit = MAX_QUANTITY if available is None else min(MAX_QUANTITY, available)
+    if cart.get(pid, 0) + quantity > limit:
+        raise CartFullError(f"Solo puedes agregar {limit} unidades de este producto")
+
+
+def add_item(session, pid, quantity=1, available=None):
+    cart = load_cart(session)
+    check_add(cart, pid, quantity, available)
+    cart[pid] = cart.get(pid, 0) + quantity
+    save_cart(session, cart)
+    return cart
+
+
+def remove_item(session, pid):
+    cart = load_cart(session)
+    if cart.pop(pid, None) is not None:
+        save_cart(session, cart)
+    return cart
+
+
+def item_count(session):
+    return sum(load_cart(session).values())
+
+
+def posted_prices(form, cart):
+    """Precios unitarios que cart.html mostró, enviados como price_<id>.
+
+    Devuelve {product_id: precio} solo para los productos del carrito; los
+    ausentes o ilegibles se omiten.
+    """
+    prices = {}
+    for pid in cart:
+        try:
+            prices[pid] = float(form[f'price_{pid}'])
+        except (KeyError, ValueError):
+            continue
+    return prices
+
+
+def resolve_cart(cart, catalog):
+    """Valida el carrito contra el catálogo y arma los renglones a mostrar.
+
+    Devuelve (items, total, removed): los productos que ya no existen se
+    omiten y se listan en removed para que el llamador limpie la sesión.
+    """
+    items = []
+    removed = []
+    total = 0
+    for pid, qty in cart.items():
+        product = catalog.get_product(pid)
+        if not product:
+            removed.append(pid)
+            continue
+        price = float(product['price'])
+        items.append({
+            'id': pid,
+            'name': product['name'],
+            'price': price,
+            'quantity': qty,
+            'subtotal': price * qty,
+            'stock': product['stock'],
+        })
+        total += price * qty
+    return items, total, removed
@@ -0,0 +1,265 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Caché en memoria con expiración por tiempo y desalojo LRU."""
+
+    def __init__(self, ttl=60, max_items=1024):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Rangos de precio del filtro: clave -> (etiqueta, mínimo inclusive, máximo exclusivo)
+PRICE_RANGES = {
+    '0-5': ('Hasta $5', None, 5),
+    '5-10': ('$5 a $10', 5, 10),
+    '10-25': ('$10 a $25', 10, 25),
+    '25-': ('Más de $25', 25, None),
+}
+
+# Orden del catálogo; cada uno se resuelve recorriendo un índice de products
+# (migrations/008_catalog_sort_indexes.sql), que termina en la llave primaria id
+SORTS = {
+    'category': ('Categoría', 'category, name, id'),
+    'name': ('Nombre', 'name, id'),
+    'price_asc': ('Menor precio', 'price, id'),
+    'price_desc': ('Mayor precio', 'price DESC, id DESC'),
+}
+
+DEFAULT_SORT = 'category'
+
+
+class CatalogCache:
+    """Catálogo de productos servido desde memoria.
+
+    Guarda las páginas del catálogo ya filtradas, los conteos de las facetas
+    (categoría y rango de precio) y un mapa id -> producto. Cada proceso de
+    gunicorn tiene su propia copia: las escrituras locales la invalidan de
+    inmediato y el TTL acota lo viejo que puede estar respecto a los demás
+    procesos. Las filas devueltas son compartidas; no modificarlas.
+    """
+
+    def __init__(self, get_db, ttl=30, max_items=2048):
+        self._get_db = get_db
+        self._cache = TTLCache(ttl=ttl, max_items=max_items)
+        # Forma parte de la clave de listas y facetas; invalidate() la
+        # incrementa y las entradas viejas salen por LRU/TTL
+        self._generation = 0
+
+    @staticmethod
+    def _normalize(product):
+        # Asegurar que image tenga un valor válido
+        if not product.get('image'):
+            product['image'] = 'placeholder.svg'
+        return product
+
+    def _load_facets(self):
+        cache_key = ('facets', self._generation)
+        facets = self._cache.get(cache_key)
+        if facets is not None:
+            return facets
+
+        # Una sola pasada: conteo por categoría y por rango de precio dentro de cada una
+        buckets = ', '.join(
+            f"SUM({self._price_condition(key)[0]}) AS `{key}`" for key in PRICE_RANGES
+        )
+        params = [p for key in PRICE_RANGES for p in self._price_condition(key)[1]]
+        conn = self._get_db()
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT category, COUNT(*) AS total, {buckets}
+                FROM products
+                WHERE stock > 0
+                GROUP BY category
+                ORDER BY category
+            """, params)
+            rows = cur.fetchall()
+
+        facets = {}
+        for row in rows:
+            facets[row['category']] = {
+                'total': int(row['total']),
+                'prices': {key: int(row[key] or 0) for key in PRICE_RANGES},
+            }
+        self._cache.set(cache_key, facets)
+        return facets
+
+    @staticmethod
+    def _price_condition(price_range):
+        _, low, high = PRICE_RANGES[price_range]
+        conditions, params = [], []
+        if low is not None:
+            conditions.append("price >= %s")
+            params.append(low)
+        if high is not None:
+            conditions.append("price < %s")
+            params.append(high)
+        return ' AND '.join(conditions), params
+
+    def facets(self, category=None, price_range=None):
+        """Conteos para los filtros del catálogo.
+
+        Cada faceta cuenta con el otro filtro aplicado: las categorías según
+        el rango de precio elegido y los rangos según la categoría elegida.
+        """
+        facets = self._load_facets()
+        selected = [facets[category]] if category in facets else facets.values()
+        return {
+            'categories': [
+                {
+                    'name': name,
+                    'count': data['prices'][price_range] if price_range in PRICE_RANGES else data['total'],
+                }
+                for name, data in facets.items()
+            ],
+            'prices': [
+                {
+                    'key': key,
+                    'label': label,
+                    'count': sum(data['prices'][key] for data in selected),
+                }
+                for key, (label, _, _) in PRICE_RANGES.items()
+            ],
+        }
+
+    def count(self, category=None, price_range=None):
+        facets = self._load_facets()
+        if category is not None:
+            facets = {category: facets[category]} if category in facets else {}
+        if price_range in PRICE_RANGES:
+            return sum(data['prices'][price_range] for data in facets.values())
+        return sum(data['total'] for data in facets.values())
+
+    def browse(self, category=None, price_range=None, sort=DEFAULT_SORT, page=1, per_page=24):
+        """Una página de productos con stock según los filtros.
+
+        Devuelve (productos, total). category y price_range en None no filtran.
+        """
+        if sort not in SORTS:
+            sort = DEFAULT_SORT
+        if price_range not in PRICE_RANGES:
+            price_range = None
+        total = self.count(category, price_range)
+        key = ('browse', self._generation, category, price_range, sort, page, per_page)
+        products = self._cache.get(key)
+        if products is not None:
+            return products, total
+        if not total:
+            return [], 0
+
+        conditions, params = ["stock > 0"], []
+        if category is not None:
+            conditions.append("category = %s")
+            params.append(category)
+        if price_range is not None:
+            condition, price_params = self._price_condition(price_range)
+            conditions.append(condition)
+            params.extend(price_params)
+        filters = ' AND '.join(conditions)
+        order_by = SORTS[sort][1]
+
+        conn = self._get_db()
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT id, name, price, category, stock, image
+                FROM products
+                WHERE {filters}
+                ORDER BY {order_by}
+                LIMIT %s OFFSET %s
+            """, params + [per_page, (max(page, 1) - 1) * per_page])
+            products = [self._normalize(p) for p in cur.fetchall()]
+        self._cache.set(key, products)
+        return products, total
+
+    def get_product(self, pid):
+        key = ('product', pid)
+        product = self._cache.get(key)
+        if product is not None:
+            return product
+
+        conn = self._get_db()
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM products WHERE id = %s", (pid,))
+            product = cur.fetchone()
+        if product:
+            self._cache.set(key, self._normalize(product))
+        return product
+
+    def get_products(self, ids):
+        """Los productos de ids en el mismo orden, omitiendo los que no existen.
+
+        Los que no están en caché se cargan con una sola consulta.
+        """
+        found = {}
+        missing = []
+        for pid in ids:
+            product = self._cache.get(('product', pid))
+            if product is not None:
+                found[pid] = product
+            else:
+                missing.append(pid)
+
+        if missing:
+            placeholders = ', '.join(['%s'] * len(missing))
+            conn = self._get_db()
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT * FROM products WHERE id IN ({placeholders})", missing)
+                for product in cur.fetchall():
+                    found[product['id']] = self._normalize(product)
+                    self._cache.set(('product', product['id']), product)
+        return [found[pid] for pid in ids if pid in found]
+
+    def invalidate(self, product_ids=None):
+        """Descarta listas, facetas y los productos indicados (o todo el catálogo)."""
+        self._generation += 1
+        if product_ids is None:
+            self._cache.clear()
+            return
+        for pid in product_ids:
+            self._cache.delete(('product', pid))
+
+    def stats(self):
+        return {
+            'entries': len(self._cache),
+            'hits': self._cache.hits,
+            'misses': self._cache.misses,
+        }
@@ -0,0 +1,154 @@
+import re
+import secrets
+
+from reservations import claim
+from sales_rollup import record_order
+
+_TOKEN_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class CheckoutError(Exception):
+    """Error de negocio al confirmar una compra (stock, precio, producto)."""
+
+
+class OutOfStock(CheckoutError):
+    """No alcanza el stock disponible para algún producto del carrito."""
+
+
+def new_checkout_token():
+    """Token de idempotencia que cart.html envía con el formulario de compra."""
+    return secrets.token_hex(16)
+
+
+def valid_checkout_token(token):
+    return token if token and _TOKEN_RE.match(token) else None
+
+
+def find_order_by_token(cur, user_id, token):
+    """Orden ya creada con ese token, o None. Devuelve (order_id, total)."""
+    cur.execute("""
+        SELECT id, total_amount
+        FROM orders_master
+        WHERE checkout_token = %s AND user_id = %s
+    """, (token, user_id))
+    order = cur.fetchone()
+    return (order['id'], order['total_amount']) if order else None
+
+
+def place_order(cur, user_id, quantities, payment_method, delivery_address,
+                expected_prices=None, checkout_token=None):
+    """Crea la orden completa con un número fijo de consultas.
+
+    quantities es un mapa {product_id: cantidad}. Las reservas del usuario
+    (reservations.py) se convierten en venta: su stock ya estaba apartado,
+    así que solo se descuenta (o se devuelve) la diferencia entre el carrito
+    y lo reservado: esas filas se bloquean en orden de id (SELECT ... ORDER BY
+    id FOR UPDATE), se valida que alcance y se actualizan en un solo UPDATE.
+    Un carrito completamente reservado no bloquea ninguna fila de products.
+    Debe llamarse dentro de una transacción; ante cualquier CheckoutError el
+    llamador hace rollback y el stock y las reservas quedan intactos.
+
+    checkout_token se guarda en la orden con un índice único: si otra
+    petición con el mismo token ya confirmó, el INSERT falla con
+    IntegrityError (1062) y el llamador responde con find_order_by_token().
+
+    Devuelve (order_id, total).
+    """
+    if not quantities:
+        raise CheckoutError("El carrito está vacío")
+
+    ids = sorted(quantities)
+    placeholders = ', '.join(['%s'] * len(ids))
+
+    # 1. Precios y nombres, sin candado: products se bloquea en el paso 4 en
+    # orden de id, después de las reservas, como en reservations.py
+    cur.execute(f"""
+        SELECT id, name, price
+        FROM products
+        WHERE id IN ({placeholders})
+    """, ids)
+    products = {p['id']: p for p in cur.fetchall()}
+
+    total = 0
+    for pid in ids:
+        product = products.get(pid)
+        qty = quantities[pid]
+        if not product:
+            raise CheckoutError(f"Producto {pid} no encontrado")
+        if expected_prices is not None and pid in expected_prices:
+            if abs(float(product['price']) - float(expected_prices[pid])) > 0.01:
+                raise CheckoutError(f"El precio de {product['name']} ha cambiado")
+        total += product['price'] * qty
+
+    # 2. Crear orden maestra antes de tocar stock: un envío duplicado espera
+    # aquí el candado del índice único y falla sin bloquear productos
+    cur.execute("""
+        INSERT INTO orders_master (
+            user_id, total_amount, payment_method,
+            delivery_address, status, created_at, checkout_token
+        )
+        VALUES (%s, %s, %s, %s, 'Pendiente', NOW(), %s)
+    """, (user_id, total, payment_method, delivery_address, checkout_token))
+    order_id = cur.lastrowid
+
+    # 3. Tomar las reservas del usuario (se bloquean antes que products)
+    holds = claim(cur, user_id)
+
+    # 4. Ajustar stock por lo que falte o sobre respecto a las reservas
+    deltas = {}
+    for pid in set(ids) | set(holds):
+        delta = quantities.get(pid, 0) - holds.get(pid, 0)
+        if delta:
+            deltas[pid] = delta
+    _adjust_stock(cur, deltas, products)
+
+    # 5. Todos los detalles en un solo INSERT de varias filas
+    cur.executemany("""
+        INSERT INTO order_details (
+            order_id, product_id, quantity,
+            unit_price, total_price
+        )
+        VALUES (%s, %s, %s, %s, %s)
+    """, [(order_id, pid, quantities[pid], products[pid]['price'],
+           products[pid]['price'] * quantities[pid]) for pid in ids])
+
+    # 6. Sumar al resumen diario al final: todas las compras del día con el
+    # mismo método de pago comparten ese renglón y su candado dura hasta el commit
+    record_order(cur, order_id)
+
+    return order_id, total
+
+
+def _adjust_stock(cur, deltas, products):
+    """Descuenta {product_id: delta} en un solo UPDATE; un delta negativo devuelve stock.
+
+    Las filas se bloquean en orden de id y se validan antes de descontar, así
+    el mensaje de error nombra al producto que de verdad no alcanzó.
+    """
+    if not deltas:
+        return
+    ids = sorted(deltas)
+    placeholders = ', '.join(['%s'] * len(ids))
+    cur.execute(f"""
+        SELECT id, stock
+        FROM products
+        WHERE id IN ({placeholders})
+        ORDER BY id
+        FOR UPDATE
+    """, ids)
+    stock = {row['id']: row['stock'] for row in cur.fetchall()}
+    for pid in ids:
+        if stock.get(pid, 0) < deltas[pid]:
+            name = products[pid]['name'] if pid in products else pid
+            raise OutOfStock(f"Producto {name} sin stock suficiente")
+
+    cases = ' '.join(['WHEN %s THEN %s'] * len(ids))
+    params = []
+    for pid in ids:
+        params.extend([pid, deltas[pid]])
+    cur.execute(f"""
+        UPDATE products
+        SET stock = stock - CASE id {cases} END,
+            updated_at = NOW()
+        WHERE id IN ({placeholders})
+    """, params + ids)
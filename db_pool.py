@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+from collections import deque
+
+import pymysql
+
+
+class PoolTimeout(Exception):
+    """No se pudo obtener una conexión del pool dentro del tiempo límite."""
+
+
+class PooledConnection:
+    """Envoltura de una conexión pymysql que recuerda cuándo fue creada."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def __getattr__(self, name):
+        # Delegar cursor(), commit(), rollback(), etc. a la conexión real
+        return getattr(self.raw, name)
+
+    def close(self):
+        # Las conexiones del pool se devuelven en el teardown, no se cierran
+        pass
+
+    def release(self):
+        self._pool.release(self)
+
+
+class ConnectionPool:
+    """Pool de conexiones MySQL seguro entre hilos.
+
+    - min_size: conexiones que se abren al primer uso y se mantienen vivas.
+    - max_size: conexiones que se guardan ociosas en el pool.
+    - max_overflow: conexiones extra permitidas por encima de max_size en
+      picos de carga; se cierran al devolverse.
+    - recycle: segundos tras los cuales una conexión se reemplaza.
+    - timeout: segundos que se espera por una conexión libre; 0 falla de
+      inmediato y None espera indefinidamente.
+    - pre_ping: verifica la conexión con ping() antes de entregarla.
+    """
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10, max_overflow=5,
+                 recycle=3600, timeout=10, pre_ping=True):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Tamaños de pool inválidos")
+        self.connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._in_use = 0
+        self._warmed = False
+        self._pid = os.getpid()
+        self._stats = {
+            'created': 0,
+            'borrowed': 0,
+            'recycled': 0,
+            'ping_failures': 0,
+            'timeouts': 0,
+            'waits': 0,
+        }
+
+    # --- ciclo de vida de las conexiones ---
+
+    def _connect(self):
+        raw = pymysql.connect(**self.connect_kwargs)
+        self._count('created')
+        return PooledConnection(self, raw)
+
+    def _count(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+    def _discard(self, conn):
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+
+    def _is_stale(self, conn):
+        return self.recycle is not None and time.monotonic() - conn.created_at > self.recycle
+
+    def _check_fork(self):
+        # Con gunicorn --preload el pool puede heredarse del proceso maestro;
+        # las conexiones no se comparten entre procesos.
+        if self._pid != os.getpid():
+            self._idle.clear()
+            self._open = 0
+            self._in_use = 0
+            self._warmed = False
+            self._pid = os.getpid()
+
+    def _warm_up(self):
+        self._warmed = True
+        while self._open < self.min_size:
+            self._open += 1
+            try:
+                self._idle.append(self._connect())
+            except Exception:
+                self._open -= 1
+                raise
+
+    def acquire(self):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._cond:
+            self._check_fork()
+            if not self._warmed:
+                self._warm_up()
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.max_size + self.max_overflow:
+                    # Reservar el lugar antes de conectar fuera del candado
+                    self._open += 1
+                    conn = None
+                    break
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout("Pool de conexiones agotado")
+                    self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+                else:
+                    self._stats['waits'] += 1
+                    self._cond.wait()
+            self._in_use += 1
+            self._stats['borrowed'] += 1
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif self._is_stale(conn):
+                self._count('recycled')
+                self._discard(conn)
+                conn = self._connect()
+            elif self.pre_ping:
+                try:
+                    conn.raw.ping(reconnect=False)
+                except Exception:
+                    self._count('ping_failures')
+                    self._discard(conn)
+                    conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        conn.last_used = time.monotonic()
+        return conn
+
+    def release(self, conn):
+        # Limpiar cualquier transacción abierta antes de reutilizar la conexión
+        healthy = True
+        try:
+            conn.raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            if conn._pool is not self or self._pid != os.getpid():
+                return
+            self._in_use -= 1
+            if healthy and len(self._idle) < self.max_size and not self._is_stale(conn):
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+                self._discard(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+                self._open -= 1
+            self._warmed = False
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'max_overflow': self.max_overflow,
+            })
+            return data
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+def pool_from_env():
+    """Crea el pool con la configuración de MYSQL_* y DB_POOL_* del entorno."""
+    timeout = os.getenv('DB_POOL_TIMEOUT', '10')
+    return ConnectionPool(
+        connect_kwargs={
+            'host': os.getenv('MYSQL_HOST', 'localhost'),
+            'user': os.getenv('MYSQL_USER', 'root'),
+            'password': os.getenv('MYSQL_PASSWORD', ''),
+            'database': os.getenv('MYSQL_DB', 'tienda_canelitos'),
+            'charset': 'utf8mb4',
+            'cursorclass': pymysql.cursors.DictCursor,
+        },
+        min_size=_env_int('DB_POOL_MIN', 1),
+        max_size=_env_int('DB_POOL_MAX', 10),
+        max_overflow=_env_int('DB_POOL_OVERFLOW', 5),
+        recycle=_env_int('DB_POOL_RECYCLE', 3600),
+        timeout=None if timeout.lower() == 'none' else float(timeout),
+        pre_ping=os.getenv('DB_POOL_PRE_PING', '1') != '0',
+    )
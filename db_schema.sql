@@ -1,4 +1,10 @@
 -- Reset database tables
+-- schema_migrations goes too: the indexes live in migrations/, so run
+-- `python migrate.py` after loading this file to rebuild them
+DROP TABLE IF EXISTS schema_migrations;
+DROP TABLE IF EXISTS sessions;
+DROP TABLE IF EXISTS reservations;
+DROP TABLE IF EXISTS daily_sales;
 DROP TABLE IF EXISTS order_details;
 DROP TABLE IF EXISTS orders_master;
 DROP TABLE IF EXISTS products;
@@ -21,6 +27,7 @@ CREATE TABLE users (
 -- Products table
 CREATE TABLE products (
     id INT PRIMARY KEY AUTO_INCREMENT,
+    sku VARCHAR(64) NULL,
     name VARCHAR(100) NOT NULL,
     category VARCHAR(50) NOT NULL,
     description TEXT,
@@ -28,7 +35,8 @@ CREATE TABLE products (
     stock INT NOT NULL DEFAULT 0,
     image VARCHAR(255) DEFAULT 'placeholder.svg',
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP NULL ON UPDATE CURRENT_TIMESTAMP
+    updated_at TIMESTAMP NULL ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_products_sku (sku)
 );
 
 -- Login history table
@@ -49,6 +57,8 @@ CREATE TABLE orders_master (
     status VARCHAR(50) NOT NULL DEFAULT 'Pendiente',
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP NULL ON UPDATE CURRENT_TIMESTAMP,
+    checkout_token CHAR(32) NULL,
+    UNIQUE KEY uq_orders_checkout_token (checkout_token),
     FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
@@ -65,6 +75,37 @@ CREATE TABLE order_details (
     FOREIGN KEY (product_id) REFERENCES products(id)
 );
 
+-- Daily sales rollup (maintained at checkout and on status changes)
+CREATE TABLE daily_sales (
+    sale_date DATE NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    orders_count INT NOT NULL DEFAULT 0,
+    total_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (sale_date, payment_method, status)
+);
+
+-- Server-side sessions (SESSION_BACKEND=mysql)
+CREATE TABLE sessions (
+    id VARCHAR(64) PRIMARY KEY,
+    data MEDIUMTEXT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    INDEX idx_sessions_expires (expires_at)
+);
+
+-- Stock reservations held by carts (see reservations.py)
+CREATE TABLE reservations (
+    user_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, product_id),
+    INDEX idx_reservations_expires (expires_at),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
 -- Insert admin user
 INSERT INTO users (username, name, email, password, role)
 VALUES ('admin', 'Administrador', 'admin@canelitos.com', 'scrypt:32768:8:1$MO97NxWiTbujIU6A$3faa767c0747f02deb8c6f7cf05f303c61181953134df976bd944bcfe0d437ecfbcfc88a410e416da6f2402d11a5a121f8ce9ad9ea6c3b6b7aee7afa53626d71', 'admin');
@@ -78,11 +119,11 @@ INSERT INTO users (username, name, email, password, role)
 VALUES ('repartidor', 'Repartidor Demo', 'repartidor@canelitos.com', 'scrypt:32768:8:1$zbSBvhqSEuPpDEIx$fcd75356eaa6927b04935e71cff7c724697e3d8b1ad09c6ee38648979d4ea1798e5a6a3da152d8729ae35ceb3d228758c3b8576d198274b4406da8b2add5483e8', 'delivery');
 
 -- Insert some demo products
-INSERT INTO products (name, category, description, price, stock) VALUES
-('Canela en Polvo 100g', 'Especias', 'Canela molida de alta calidad', 5.99, 50),
-('Canela en Rama 50g', 'Especias', 'Ramas de canela selecta', 7.99, 30),
-('Mix de Especias', 'Especias', 'Mezcla especial con canela', 9.99, 25),
-('Té de Canela', 'Bebidas', 'Té aromático de canela', 4.99, 40),
-('Galletas de Canela', 'Repostería', 'Galletas artesanales', 6.99, 35);
+INSERT INTO products (sku, name, category, description, price, stock) VALUES
+('P000001', 'Canela en Polvo 100g', 'Especias', 'Canela molida de alta calidad', 5.99, 50),
+('P000002', 'Canela en Rama 50g', 'Especias', 'Ramas de canela selecta', 7.99, 30),
+('P000003', 'Mix de Especias', 'Especias', 'Mezcla especial con canela', 9.99, 25),
+('P000004', 'Té de Canela', 'Bebidas', 'Té aromático de canela', 4.99, 40),
+('P000005', 'Galletas de Canela', 'Repostería', 'Galletas artesanales', 6.99, 35);
 
 COMMIT;
\ No newline at end of file
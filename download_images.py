@@ -1,68 +1,217 @@
+"""Ingesta de imágenes de productos a static/img.
+
+Lee un manifiesto JSON {archivo_destino: origen}, donde el origen es una URL
+o una ruta local. Las descargas corren en paralelo en un pool de hilos con
+una sesión HTTP compartida y tiempos límite; la decodificación y el
+redimensionado con Pillow corren en un pool de procesos. Las imágenes cuyo
+contenido no cambió desde la última ingesta (mismo SHA-256) se omiten.
+
+    python download_images.py                                  # images_manifest.json
+    python download_images.py --manifest images_manifest_pixabay.json
+    python download_images.py --source-dir ./fotos             # sin red: todo el directorio
+    python download_images.py --manifest m.json --source-dir ./fotos
+
+Al terminar escribe un resumen con tiempos, throughput y fallas.
+"""
+import argparse
+import hashlib
+import json
 import os
-import requests
-from PIL import Image
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from io import BytesIO
 
-def download_image(url, filename):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        image = Image.open(BytesIO(response.content))
-        
-        # Resize to a reasonable size (e.g., 400x400 max)
-        image.thumbnail((400, 400))
-        
-        # Convert to RGB if saving as JPEG
-        if filename.lower().endswith('.jpg') or filename.lower().endswith('.jpeg'):
-            image = image.convert('RGB')
-        
-        # Save with good quality
-        image.save(filename, optimize=True, quality=85)
-        print(f"Successfully downloaded and saved {filename}")
-        return True
-    except Exception as e:
-        print(f"Error downloading {filename}: {str(e)}")
-        return False
+from images import IMG_DIR, RASTER_EXTENSIONS, SIZES, generate_variants, save_resized
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MANIFEST = os.path.join(BASE_DIR, 'images_manifest.json')
+STATE_FILE = os.path.join(IMG_DIR, '.ingest_state.json')
+SUMMARY_FILE = os.path.join(BASE_DIR, 'instance', 'ingest_summary.json')
+
+# Lado máximo del archivo guardado en static/img; las variantes salen de él
+MAX_SOURCE_SIDE = SIZES['large']
+TIMEOUT = (5, 30)  # (conexión, lectura) en segundos
+
 
 def create_placeholder():
-    img_dir = os.path.join('static', 'img')
     placeholder_svg = '''<svg width="200" height="200" xmlns="http://www.w3.org/2000/svg">
         <rect width="200" height="200" fill="#f8d7da"/>
         <text x="100" y="100" text-anchor="middle" font-family="Arial" font-size="16" fill="#721c24">Product Image</text>
         <text x="100" y="120" text-anchor="middle" font-family="Arial" font-size="12" fill="#721c24">Placeholder</text>
     </svg>'''
-    
-    placeholder_path = os.path.join(img_dir, "placeholder.svg")
+
+    placeholder_path = os.path.join(IMG_DIR, "placeholder.svg")
     with open(placeholder_path, 'w', encoding='utf-8') as f:
         f.write(placeholder_svg)
     print("Created: placeholder.svg")
     return placeholder_path
 
-def main():
-    # Create img directory if it doesn't exist
-    img_dir = os.path.join('static', 'img')
-    os.makedirs(img_dir, exist_ok=True)
-    
-    # Create placeholder first
-    create_placeholder()
-    
-    # Imágenes de logos de programación
-    images = {
-        'coca_cola_355ml.png': 'https://raw.githubusercontent.com/github/explore/main/topics/python/python.png',
-        'agua_1l.png': 'https://raw.githubusercontent.com/github/explore/main/topics/javascript/javascript.png',
-        'pan_blanco.jpg': 'https://raw.githubusercontent.com/github/explore/main/topics/java/java.png',
-        'leche_1l.jpg': 'https://raw.githubusercontent.com/github/explore/main/topics/html/html.png',
-        'papas_fritas.png': 'https://raw.githubusercontent.com/github/explore/main/topics/css/css.png',
-        'arroz_1kg.png': 'https://raw.githubusercontent.com/github/explore/main/topics/nodejs/nodejs.png',
-        'servilletas.png': 'https://raw.githubusercontent.com/github/explore/main/topics/react/react.png',
-        'jabon_liquido.png': 'https://raw.githubusercontent.com/github/explore/main/topics/vue/vue.png'
+
+# --- Obtención (hilos) ---
+
+def make_session(workers):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=2)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch(session, source, source_dir):
+    """Devuelve los bytes del origen (URL o archivo local)."""
+    if source.startswith(('http://', 'https://')):
+        response = session.get(source, timeout=TIMEOUT)
+        response.raise_for_status()
+        return response.content
+    path = source if os.path.isabs(source) else os.path.join(source_dir, source)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+# --- Procesamiento (procesos) ---
+
+def process_image(filename, data):
+    """Redimensiona y guarda la imagen y sus variantes. Corre en un proceso hijo."""
+    from PIL import Image
+
+    target = os.path.join(IMG_DIR, filename)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with Image.open(BytesIO(data)) as image:
+        image.load()
+        save_resized(image, target, MAX_SOURCE_SIDE)
+    variants = generate_variants(filename, force=True)
+    return os.path.getsize(target), len(variants)
+
+
+# --- Estado e ingesta ---
+
+def load_state():
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    tmp = STATE_FILE + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, STATE_FILE)
+
+
+def load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def manifest_from_dir(source_dir):
+    return {
+        name: name
+        for name in sorted(os.listdir(source_dir))
+        if os.path.splitext(name)[1].lower() in RASTER_EXTENSIONS
     }
-    
-    # Download each image
-    for filename, url in images.items():
-        filepath = os.path.join(img_dir, filename)
-        print(f"Downloading {filename}...")
-        download_image(url, filepath)
+
+
+def ingest(manifest, source_dir, workers=8, processes=None, force=False):
+    state = load_state()
+    summary = {
+        'total': len(manifest),
+        'processed': 0,
+        'skipped': 0,
+        'failed': {},
+        'bytes_in': 0,
+        'bytes_out': 0,
+        'variants': 0,
+    }
+    started = time.monotonic()
+    session = make_session(workers) if any(
+        str(src).startswith(('http://', 'https://')) for src in manifest.values()) else None
+
+    with ThreadPoolExecutor(max_workers=workers) as fetchers, \
+            ProcessPoolExecutor(max_workers=processes) as resizers:
+        downloads = {fetchers.submit(fetch, session, src, source_dir): name
+                     for name, src in manifest.items()}
+        resizing = {}
+        hashes = {}
+
+        for future in as_completed(downloads):
+            name = downloads[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                summary['failed'][name] = f"descarga: {str(e)}"
+                print(f"Error descargando {name}: {str(e)}")
+                continue
+
+            summary['bytes_in'] += len(data)
+            digest = hashlib.sha256(data).hexdigest()
+            if not force and state.get(name) == digest and os.path.exists(os.path.join(IMG_DIR, name)):
+                summary['skipped'] += 1
+                continue
+            hashes[name] = digest
+            resizing[resizers.submit(process_image, name, data)] = name
+
+        for future in as_completed(resizing):
+            name = resizing[future]
+            try:
+                size, variants = future.result()
+            except Exception as e:
+                summary['failed'][name] = f"procesamiento: {str(e)}"
+                print(f"Error procesando {name}: {str(e)}")
+                continue
+            state[name] = hashes[name]
+            summary['processed'] += 1
+            summary['bytes_out'] += size
+            summary['variants'] += variants
+            print(f"Guardado {name} ({variants} variantes)")
+
+    elapsed = time.monotonic() - started
+    summary['seconds'] = round(elapsed, 3)
+    summary['images_per_second'] = round(summary['processed'] / elapsed, 2) if elapsed else 0
+    summary['mb_per_second'] = round(summary['bytes_in'] / elapsed / 1e6, 3) if elapsed else 0
+    save_state(state)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingesta concurrente de imágenes de productos")
+    parser.add_argument('--manifest', help="JSON {archivo: url_o_ruta}; por defecto images_manifest.json")
+    parser.add_argument('--source-dir', help="directorio local para rutas relativas (o a ingerir completo)")
+    parser.add_argument('--workers', type=int, default=8, help="descargas simultáneas")
+    parser.add_argument('--processes', type=int, default=None, help="procesos para Pillow")
+    parser.add_argument('--force', action='store_true', help="reprocesar aunque el contenido no cambie")
+    parser.add_argument('--summary', default=SUMMARY_FILE, help="archivo JSON del resumen")
+    args = parser.parse_args(argv)
+
+    os.makedirs(IMG_DIR, exist_ok=True)
+    create_placeholder()
+
+    if args.manifest or not args.source_dir:
+        manifest_path = args.manifest or DEFAULT_MANIFEST
+        manifest = load_manifest(manifest_path)
+        source_dir = args.source_dir or os.path.dirname(os.path.abspath(manifest_path))
+    else:
+        source_dir = args.source_dir
+        manifest = manifest_from_dir(source_dir)
+
+    summary = ingest(manifest, source_dir, workers=args.workers,
+                     processes=args.processes, force=args.force)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.summary)), exist_ok=True)
+    with open(args.summary, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Procesadas: {summary['processed']}, sin cambios: {summary['skipped']}, "
+          f"fallidas: {len(summary['failed'])} de {summary['total']} "
+          f"en {summary['seconds']}s ({summary['images_per_second']} img/s, "
+          f"{summary['mb_per_second']} MB/s)")
+    return 1 if summary['failed'] else 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
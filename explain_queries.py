@@ -0,0 +1,189 @@
+"""Ejecuta EXPLAIN sobre las consultas de la aplicación y señala recorridos completos.
+
+Extrae los SELECT/UPDATE/DELETE escritos en el código (incluidos los f-strings
+de los módulos auxiliares cuando sus partes dinámicas son conocidas), suma
+las consultas de ejemplo de SAMPLE_QUERIES para las que se arman con
+expresiones, sustituye los parámetros %s por valores de ejemplo y revisa el
+plan:
+
+- type = ALL   -> recorrido completo de la tabla (error)
+- type = index -> recorrido completo de un índice (aviso)
+- Using filesort / Using temporary en Extra (aviso)
+
+    python explain_queries.py
+
+Devuelve código 1 si alguna consulta recorre una tabla completa.
+"""
+import ast
+import os
+import re
+import sys
+
+from migrate import get_connection
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCES = [
+    'app.py', 'catalog_cache.py', 'checkout.py', 'kpis.py', 'orders.py', 'pdf_reports.py',
+    'product_import.py', 'reports.py', 'reservations.py', 'sales_rollup.py', 'search.py',
+]
+
+# Valores de ejemplo para las partes dinámicas de los f-strings
+FSTRING_VALUES = {
+    'placeholders': '%s, %s',
+    'cases': 'WHEN %s THEN %s WHEN %s THEN %s',
+    'pairs': '(%s, %s), (%s, %s)',
+    'order': 'DESC',
+    'op': '<',
+    'where': '',
+    'filters': "stock > 0 AND category = %s AND price >= %s AND price < %s",
+    'order_by': 'price, id',
+    'date_filter': '{created_at} >= %s AND {created_at} < %s',
+    'status_filter': 'AND om.status IN (%s, %s)',
+    'buckets': 'SUM(price < %s) AS `0-5`, SUM(price >= %s) AS `25-`',
+}
+
+# Consultas cuyo f-string no se puede reconstruir desde el código (listas IN
+# armadas en línea, columnas calculadas): se auditan con un SQL de ejemplo
+# equivalente, identificado por la función que la ejecuta
+SAMPLE_QUERIES = {
+    'product_import.py': [
+        ('_held_by_sku', "SELECT id, sku FROM products WHERE sku IN (%s, %s)"),
+        ('_held_by_sku', """
+            SELECT product_id, SUM(quantity) AS held
+            FROM reservations
+            WHERE product_id IN (%s, %s)
+            GROUP BY product_id
+            FOR UPDATE
+        """),
+        ('export_products', """
+            SELECT p.sku, p.name, p.price, CAST(p.stock + COALESCE(h.held, 0) AS SIGNED) AS stock
+            FROM products p
+            LEFT JOIN (
+                SELECT product_id, SUM(quantity) AS held
+                FROM reservations
+                GROUP BY product_id
+            ) h ON h.product_id = p.id
+            ORDER BY p.id
+        """),
+    ],
+}
+
+SQL_START = re.compile(r'^\s*(SELECT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+def _render(node):
+    """Convierte un str o f-string del AST en SQL, o None si no se puede."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif (isinstance(value, ast.FormattedValue) and isinstance(value.value, ast.Name)
+                  and value.value.id in FSTRING_VALUES):
+                parts.append(FSTRING_VALUES[value.value.id])
+            else:
+                return None
+        return ''.join(parts)
+    return None
+
+
+def _paginated_query(call):
+    """Arma la consulta real de una llamada a fetch_orders_page(cur, select, conditions)."""
+    if len(call.args) < 2:
+        return None
+    select = _render(call.args[1])
+    if select is None:
+        return None
+    conditions = []
+    if len(call.args) > 2 and isinstance(call.args[2], ast.List):
+        conditions = [_render(elt) for elt in call.args[2].elts]
+        if None in conditions:
+            return None
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    return f"{select}{where} ORDER BY om.created_at DESC, om.id DESC LIMIT %s"
+
+
+def extract_queries(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    # Las constantes dentro de f-strings o de fetch_orders_page se leen junto
+    # con la expresión completa, no por separado
+    handled = set()
+    queries = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.JoinedStr):
+            handled.update(id(value) for value in node.values)
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+              and node.func.id == 'fetch_orders_page'):
+            sql = _paginated_query(node)
+            if sql:
+                handled.update(id(arg) for arg in node.args[1:2])
+                queries.append((node.lineno, sql))
+
+    for node in ast.walk(tree):
+        if id(node) in handled:
+            continue
+        if isinstance(node, ast.JoinedStr) or (isinstance(node, ast.Constant) and isinstance(node.value, str)):
+            sql = _render(node)
+            if sql and SQL_START.match(sql):
+                queries.append((node.lineno, sql))
+    result = []
+    for lineno, sql in queries:
+        # Calificar la columna de fecha cuando la consulta usa el alias om
+        column = 'om.created_at' if 'orders_master om' in sql else 'created_at'
+        result.append((lineno, ' '.join(sql.replace('{created_at}', column).split())))
+    return sorted(result)
+
+
+def sample_queries(source):
+    return [(name, ' '.join(sql.split())) for name, sql in SAMPLE_QUERIES.get(source, [])]
+
+
+def with_sample_params(sql):
+    sql = re.sub(r'LIMIT\s+%s', 'LIMIT 10', sql, flags=re.IGNORECASE)
+    return sql.replace('%s', "'1'")
+
+
+def explain(cur, sql):
+    cur.execute('EXPLAIN ' + with_sample_params(sql))
+    return cur.fetchall()
+
+
+def main():
+    conn = get_connection()
+    full_scans = 0
+    try:
+        with conn.cursor() as cur:
+            for source in SOURCES:
+                queries = extract_queries(os.path.join(BASE_DIR, source)) + sample_queries(source)
+                for where, sql in queries:
+                    print(f"\n{source}:{where}  {sql[:110]}")
+                    try:
+                        plan = explain(cur, sql)
+                    except Exception as e:
+                        print(f"  [omitida] {str(e)}")
+                        continue
+                    for row in plan:
+                        access = row.get('type')
+                        extra = row.get('Extra') or ''
+                        label = 'OK'
+                        if access == 'ALL':
+                            label = 'RECORRIDO COMPLETO'
+                            full_scans += 1
+                        elif access == 'index' or 'filesort' in extra or 'temporary' in extra:
+                            label = 'AVISO'
+                        print(f"  [{label}] tabla={row.get('table')} type={access} "
+                              f"key={row.get('key')} rows={row.get('rows')} extra={extra}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+    print(f"\nConsultas con recorrido completo: {full_scans}")
+    return 1 if full_scans else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
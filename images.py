@@ -0,0 +1,111 @@
+"""Variantes redimensionadas de las imágenes de productos.
+
+Por cada imagen de static/img se generan varios tamaños, en su formato
+original y en WebP, dentro de static/img/_variants:
+
+    static/img/_variants/pan_blanco_thumb.jpg
+    static/img/_variants/pan_blanco_thumb.webp
+    ...
+
+Se generan al descargar/ingresar imágenes (download_images.py) o con:
+
+    python images.py [archivo ...]
+
+La ruta /img elige la variante según ?size= y el encabezado Accept; si una
+variante no existe se sirve el original.
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMG_DIR = os.path.join(BASE_DIR, 'static', 'img')
+VARIANTS_DIR = os.path.join(IMG_DIR, '_variants')
+
+# Lado máximo en píxeles de cada tamaño
+SIZES = {
+    'thumb': 200,
+    'medium': 400,
+    'large': 800,
+}
+
+RASTER_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif'}
+
+
+def save_resized(image, filename, max_side, quality=85):
+    """Reduce la imagen a max_side x max_side y la guarda optimizada."""
+    image = image.copy()
+    image.thumbnail((max_side, max_side))
+
+    # Convert to RGB if saving as JPEG
+    if filename.lower().endswith(('.jpg', '.jpeg')):
+        image = image.convert('RGB')
+
+    image.save(filename, optimize=True, quality=quality)
+
+
+def variant_path(filename, size, webp=False):
+    stem, ext = os.path.splitext(filename)
+    return os.path.join(VARIANTS_DIR, f"{stem}_{size}{'.webp' if webp else ext.lower()}")
+
+
+def generate_variants(filename, force=False):
+    """Genera todos los tamaños (original y WebP) de static/img/<filename>.
+
+    Omite las variantes más nuevas que el original. Devuelve la lista de
+    archivos escritos.
+    """
+    from PIL import Image
+
+    source = os.path.join(IMG_DIR, filename)
+    if os.path.splitext(filename)[1].lower() not in RASTER_EXTENSIONS:
+        return []
+
+    source_mtime = os.path.getmtime(source)
+    targets = []
+    for size in SIZES:
+        for webp in (False, True):
+            path = variant_path(filename, size, webp)
+            if force or not os.path.exists(path) or os.path.getmtime(path) < source_mtime:
+                targets.append((size, path))
+    if not targets:
+        return []
+
+    os.makedirs(os.path.dirname(variant_path(filename, 'thumb')), exist_ok=True)
+    written = []
+    with Image.open(source) as image:
+        image.load()
+        for size, path in targets:
+            save_resized(image, path, SIZES[size])
+            written.append(path)
+    return written
+
+
+def pick_image(filename, size=None, accept_webp=False):
+    """Devuelve la ruta a servir para filename y el tamaño pedido."""
+    if size in SIZES:
+        if accept_webp:
+            path = variant_path(filename, size, webp=True)
+            if os.path.exists(path):
+                return path
+        path = variant_path(filename, size)
+        if os.path.exists(path):
+            return path
+    return os.path.join(IMG_DIR, filename)
+
+
+def main(argv):
+    names = argv or sorted(os.listdir(IMG_DIR))
+    for name in names:
+        if not os.path.isfile(os.path.join(IMG_DIR, name)):
+            continue
+        try:
+            written = generate_variants(name, force=bool(argv))
+            if written:
+                print(f"{name}: {len(written)} variantes")
+        except Exception as e:
+            print(f"Error generando variantes de {name}: {str(e)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
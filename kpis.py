@@ -0,0 +1,70 @@
+from catalog_cache import TTLCache
+
+
+class KPIService:
+    """Indicadores de ventas de los tableros calculados en una sola consulta.
+
+    Ventas, tickets, ticket promedio, pedidos por estado y personal activo
+    salen de un mismo viaje a la base de datos, leyendo los renglones ya
+    agregados de daily_sales en vez de las órdenes. El resultado se memoriza por
+    ventana de tiempo durante `ttl` segundos y lo comparten el tablero del
+    administrador y el del vendedor.
+    """
+
+    def __init__(self, get_db, ttl=15, max_items=64):
+        self._get_db = get_db
+        self._cache = TTLCache(ttl=ttl, max_items=max_items)
+
+    def summary(self, window):
+        key = (window.start, window.end)
+        result = self._cache.get(key)
+        if result is not None:
+            return result
+
+        conn = self._get_db()
+        with conn.cursor() as cur:
+            # El LEFT JOIN desde el conteo de personal garantiza al menos una
+            # fila aunque no haya pedidos en la ventana
+            cur.execute("""
+                SELECT ds.status,
+                       COALESCE(SUM(ds.orders_count), 0) AS tickets,
+                       COALESCE(SUM(ds.total_amount), 0) AS ventas,
+                       e.empleados
+                FROM (
+                    SELECT COUNT(*) AS empleados
+                    FROM users
+                    WHERE role IN ('seller','delivery') AND active = 1
+                ) e
+                LEFT JOIN daily_sales ds
+                    ON ds.sale_date >= %s AND ds.sale_date < %s
+                GROUP BY ds.status, e.empleados
+            """, (window.start.date(), window.end.date()))
+            rows = cur.fetchall()
+
+        result = self._summarize(rows)
+        self._cache.set(key, result)
+        return result
+
+    @staticmethod
+    def _summarize(rows):
+        ventas = 0
+        tickets = 0
+        empleados = 0
+        por_estado = {}
+        for row in rows:
+            empleados = row['empleados']
+            if row['status'] is None or not row['tickets']:
+                continue
+            por_estado[row['status']] = row['tickets']
+            tickets += row['tickets']
+            ventas += row['ventas']
+        return {
+            'ventas': ventas,
+            'tickets': tickets,
+            'ticket_promedio': ventas / tickets if tickets else 0,
+            'por_estado': por_estado,
+            'empleados': empleados,
+        }
+
+    def invalidate(self):
+        self._cache.clear()
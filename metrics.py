@@ -0,0 +1,361 @@
+"""Métricas de la aplicación en formato de texto de Prometheus.
+
+Contadores, gauges e histogramas en memoria con etiquetas, servidos por
+/metrics. Con gunicorn cada worker es un proceso con sus propios valores:
+si METRICS_DIR está definido, cada proceso escribe periódicamente una foto
+de sus métricas en METRICS_DIR/metrics-<pid>.json y /metrics suma las de
+todos los procesos. Los contadores e histogramas de procesos que ya
+terminaron se siguen sumando (para que los totales no retrocedan); los
+gauges solo cuentan procesos vivos. Al arrancar, cada proceso pasa los
+archivos de procesos muertos (incluido uno anterior con su mismo pid) a
+METRICS_DIR/aggregate.json y los borra. El directorio debe vaciarse al
+desplegar, antes de arrancar gunicorn.
+
+Las métricas que otros módulos ya cuentan (caché del catálogo, pool,
+reintentos) se copian con collect(): funciones que se llaman justo antes de
+cada foto o exposición.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+
+# Límites (segundos) del histograma de latencia por ruta
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _merge(merged, snapshot, gauges=True):
+    """Suma una foto (formato de _snapshot) sobre merged."""
+    for name, data in snapshot.items():
+        if data['type'] == 'gauge' and not gauges:
+            continue
+        target = merged.setdefault(name, dict(data, values={}))
+        for labels, value in data['values']:
+            key = tuple(labels)
+            if data['type'] == 'histogram':
+                current = target['values'].get(key)
+                if current is None:
+                    target['values'][key] = [list(value[0]), value[1]]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+            else:
+                target['values'][key] = target['values'].get(key, 0) + value
+    return merged
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = registry._lock
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} requiere las etiquetas {self.labelnames}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        """Copia un total que otro módulo ya acumula (solo desde collect())."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [conteo por barra (no acumulado) + barra +Inf, suma]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            for i, limit in enumerate(self.buckets):
+                if value <= limit:
+                    entry[0][i] += 1
+                    break
+            else:
+                entry[0][-1] += 1
+            entry[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(k), [list(v[0]), v[1]]] for k, v in self._values.items()]
+
+
+class MetricsRegistry:
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    # --- definición ---
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(self, name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(Gauge(self, name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self, name, help, labelnames, buckets))
+
+    def collect(self, fn):
+        """Registra fn() para actualizar métricas copiadas de otros módulos."""
+        self._collectors.append(fn)
+        return fn
+
+    def _run_collectors(self):
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as e:
+                print("Error recolectando métricas:", str(e))
+
+    # --- modo multiproceso ---
+
+    def _file(self, pid=None):
+        return os.path.join(self.directory, f"metrics-{pid or os.getpid()}.json")
+
+    def _aggregate_file(self):
+        return os.path.join(self.directory, 'aggregate.json')
+
+    def _dir_lock(self, mode):
+        """Candado entre procesos sobre METRICS_DIR: LOCK_EX al consolidar, LOCK_SH al leer."""
+        f = open(os.path.join(self.directory, '.lock'), 'a')
+        fcntl.flock(f, mode)
+        return f
+
+    def _read(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _fold_dead(self):
+        """Pasa a aggregate.json los contadores de procesos muertos y borra sus archivos.
+
+        El archivo con el pid propio es de un proceso anterior que tuvo el
+        mismo pid: este aún no escribió el suyo.
+        """
+        lock = self._dir_lock(fcntl.LOCK_EX)
+        try:
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                try:
+                    pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+                except ValueError:
+                    continue
+                if pid == os.getpid() or not _pid_alive(pid):
+                    dead.append(path)
+            if not dead:
+                return
+            merged = {}
+            if os.path.exists(self._aggregate_file()):
+                _merge(merged, self._read(self._aggregate_file()))
+            for path in dead:
+                try:
+                    _merge(merged, self._read(path), gauges=False)
+                except (ValueError, OSError):
+                    continue
+            aggregate = {
+                name: dict(data, values=[[list(k), v] for k, v in data['values'].items()])
+                for name, data in merged.items()
+            }
+            tmp = self._aggregate_file() + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(aggregate, f)
+            os.replace(tmp, self._aggregate_file())
+            for path in dead:
+                os.remove(path)
+        finally:
+            lock.close()
+
+    def ensure_started(self):
+        # Un hilo por proceso (después del fork de gunicorn) que guarda la foto
+        if not self.directory or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            try:
+                self._fold_dead()
+            except Exception as e:
+                print("Error consolidando métricas:", str(e))
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _snapshot(self):
+        self._run_collectors()
+        return {
+            name: {
+                'type': m.type,
+                'help': m.help,
+                'labelnames': list(m.labelnames),
+                'buckets': list(getattr(m, 'buckets', [])),
+                'values': m.snapshot(),
+            }
+            for name, m in self._metrics.items()
+        }
+
+    def flush(self):
+        """Escribe la foto de este proceso en METRICS_DIR."""
+        if not self.directory:
+            return
+        try:
+            path = self._file()
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._snapshot(), f)
+            os.replace(tmp, path)
+        except Exception as e:
+            print("Error guardando métricas:", str(e))
+
+    def _gather(self):
+        """Fotos de todos los procesos: [(pid, vivo, foto)]; aggregate.json va con pid None."""
+        if not self.directory:
+            return [(os.getpid(), True, self._snapshot())]
+        self.ensure_started()
+        self.flush()
+        snapshots = []
+        # Compartido: que un _fold_dead() a medias no cuente dos veces ni omita un proceso
+        lock = self._dir_lock(fcntl.LOCK_SH)
+        try:
+            if os.path.exists(self._aggregate_file()):
+                try:
+                    snapshots.append((None, False, self._read(self._aggregate_file())))
+                except (ValueError, OSError):
+                    pass
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                try:
+                    pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+                    snapshots.append((pid, pid == os.getpid() or _pid_alive(pid), self._read(path)))
+                except (ValueError, OSError):
+                    continue
+        finally:
+            lock.close()
+        return snapshots
+
+    # --- exposición ---
+
+    def exposition(self):
+        """Todas las métricas en el formato de texto de Prometheus (0.0.4)."""
+        merged = {}
+        for _, alive, snapshot in self._gather():
+            _merge(merged, snapshot, gauges=alive)
+
+        lines = []
+        for name in sorted(merged):
+            data = merged[name]
+            lines.append(f"# HELP {name} {data['help']}")
+            lines.append(f"# TYPE {name} {data['type']}")
+            names = data['labelnames']
+            for key in sorted(data['values']):
+                value = data['values'][key]
+                if data['type'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(names, key)} {_format_value(value)}")
+                    continue
+                counts, total = value
+                cumulative = 0
+                for limit, count in zip(data['buckets'] + [float('inf')], counts):
+                    cumulative += count
+                    le = f'le="{_format_value(limit)}"'
+                    lines.append(f"{name}_bucket{_format_labels(names, key, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(names, key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(names, key)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+def registry_from_env():
+    registry = MetricsRegistry(
+        directory=os.getenv('METRICS_DIR') or None,
+        flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', '5')),
+    )
+    atexit.register(registry.flush)
+    return registry
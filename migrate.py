@@ -0,0 +1,117 @@
+"""Aplica las migraciones de migrations/ que aún no se han ejecutado.
+
+Cada archivo NNN_nombre.sql se aplica una sola vez y queda registrado en la
+tabla schema_migrations. db_schema.sql borra esa tabla junto con las demás,
+así que después de cargarlo hay que correr este script para recrear los
+índices; lo que el esquema ya trae se omite.
+
+    python migrate.py            # aplicar pendientes
+    python migrate.py --status   # listar aplicadas y pendientes
+"""
+import os
+import re
+import sys
+
+import pymysql
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Errores que indican que el objeto ya existe (p. ej. creado por db_schema.sql)
+ALREADY_APPLIED_ERRORS = {
+    1050,  # Table already exists
+    1060,  # Duplicate column name
+    1061,  # Duplicate key name
+    1091,  # Can't DROP; check that column/key exists
+}
+
+
+def get_connection():
+    return pymysql.connect(
+        host=os.getenv('MYSQL_HOST', 'localhost'),
+        user=os.getenv('MYSQL_USER', 'root'),
+        password=os.getenv('MYSQL_PASSWORD', ''),
+        database=os.getenv('MYSQL_DB', 'tienda_canelitos'),
+        charset='utf8mb4',
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+def available_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r'^(\d+)_(.+)\.sql$', filename)
+        if match:
+            migrations.append((match.group(1), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return migrations
+
+
+def split_statements(sql):
+    # Quitar comentarios de línea y separar por ';'
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [stmt.strip() for stmt in '\n'.join(lines).split(';') if stmt.strip()]
+
+
+def ensure_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(20) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cur):
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cur.fetchall()}
+
+
+def apply_migration(conn, version, name, path):
+    with open(path, 'r', encoding='utf-8') as f:
+        statements = split_statements(f.read())
+    with conn.cursor() as cur:
+        for statement in statements:
+            try:
+                cur.execute(statement)
+            except pymysql.err.OperationalError as e:
+                if e.args[0] not in ALREADY_APPLIED_ERRORS:
+                    raise
+                print(f"  ya existe, se omite: {statement.splitlines()[0][:80]}")
+        cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+    conn.commit()
+
+
+def main(argv):
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            ensure_table(cur)
+            done = applied_versions(cur)
+        conn.commit()
+
+        pending = [m for m in available_migrations() if m[0] not in done]
+        if '--status' in argv:
+            for version, name, _ in available_migrations():
+                estado = 'aplicada' if version in done else 'pendiente'
+                print(f"{version} {name}: {estado}")
+            return 0
+
+        if not pending:
+            print("No hay migraciones pendientes")
+        for version, name, path in pending:
+            print(f"Aplicando {version} {name}...")
+            apply_migration(conn, version, name, path)
+        return 0
+    except Exception as e:
+        print(f"Error al aplicar migraciones: {str(e)}")
+        conn.rollback()
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
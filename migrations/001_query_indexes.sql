@@ -0,0 +1,22 @@
+-- Índices para las consultas que ejecuta app.py
+-- Aplicar con: python migrate.py
+
+-- Listados de pedidos paginados por (created_at, id) y reportes por rango de fecha
+CREATE INDEX idx_orders_created ON orders_master (created_at, id);
+
+-- Pedidos del repartidor: status IN ('Pendiente', 'En camino') ordenados por fecha
+CREATE INDEX idx_orders_status_created ON orders_master (status, created_at, id);
+
+-- Pedidos de un cliente en su perfil (también sirve al FK de user_id)
+CREATE INDEX idx_orders_user_created ON orders_master (user_id, created_at, id);
+
+-- Conteo de empleados: role IN ('seller','delivery') AND active = 1 (cubriente)
+CREATE INDEX idx_users_role_active ON users (role, active);
+
+-- Catálogo: stock > 0 ORDER BY category, name se resuelve recorriendo el índice
+-- en orden y filtrando stock sin tocar la tabla para la condición
+CREATE INDEX idx_products_catalog ON products (category, name, stock);
+
+-- Detalles por pedido: order_details.order_id ya tiene el índice implícito de su
+-- FOREIGN KEY; este lo extiende para resolver el JOIN con products desde el índice
+CREATE INDEX idx_order_details_order_product ON order_details (order_id, product_id);
@@ -0,0 +1,13 @@
+-- Resumen diario de ventas por método de pago y estado.
+-- Se mantiene en la misma transacción que checkout() y update_order_status();
+-- para llenarlo con el historial: python sales_rollup.py backfill
+
+CREATE TABLE daily_sales (
+    sale_date DATE NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    orders_count INT NOT NULL DEFAULT 0,
+    total_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (sale_date, payment_method, status)
+);
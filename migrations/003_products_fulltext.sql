@@ -0,0 +1,2 @@
+-- Índice FULLTEXT de respaldo para la búsqueda de productos (search.py)
+CREATE FULLTEXT INDEX ft_products_search ON products (name, category, description);
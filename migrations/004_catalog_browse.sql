@@ -0,0 +1,12 @@
+-- Índices para el catálogo filtrado de home() (catalog_cache.CatalogCache.browse)
+-- idx_products_catalog (category, name, stock) ya cubre el orden por categoría
+-- y el filtro por categoría ordenado por nombre
+
+-- Filtro por categoría y rango de precio, u ordenado por precio dentro de la categoría
+CREATE INDEX idx_products_category_price ON products (category, price, stock);
+
+-- Todo el catálogo ordenado o filtrado por precio
+CREATE INDEX idx_products_price ON products (price, stock);
+
+-- Todo el catálogo ordenado por nombre
+CREATE INDEX idx_products_name ON products (name, stock);
@@ -0,0 +1,7 @@
+-- SKU único por producto: clave de la importación masiva (product_import.py)
+ALTER TABLE products ADD COLUMN sku VARCHAR(64) NULL AFTER id;
+
+-- Productos existentes: SKU derivado del id
+UPDATE products SET sku = CONCAT('P', LPAD(id, 6, '0')) WHERE sku IS NULL;
+
+CREATE UNIQUE INDEX uq_products_sku ON products (sku);
@@ -0,0 +1,11 @@
+-- Reservas de stock de los carritos (reservations.py)
+CREATE TABLE reservations (
+    user_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, product_id),
+    INDEX idx_reservations_expires (expires_at),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
@@ -0,0 +1,5 @@
+-- Token de idempotencia del checkout: un reenvío del mismo formulario no crea
+-- una segunda orden (checkout.place_order)
+ALTER TABLE orders_master ADD COLUMN checkout_token CHAR(32) NULL;
+
+CREATE UNIQUE INDEX uq_orders_checkout_token ON orders_master (checkout_token);
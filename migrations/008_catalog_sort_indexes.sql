@@ -0,0 +1,17 @@
+-- Índices del catálogo sin stock al final: InnoDB agrega la llave primaria a
+-- cada índice secundario, así (name) se recorre como (name, id) y resuelve
+-- ORDER BY name, id sin filesort. Con stock en medio el desempate por id
+-- obligaba a ordenar. El filtro stock > 0 se evalúa sobre la fila, que
+-- CatalogCache.browse() lee de todas formas.
+
+DROP INDEX idx_products_catalog ON products;
+CREATE INDEX idx_products_catalog ON products (category, name);
+
+DROP INDEX idx_products_category_price ON products;
+CREATE INDEX idx_products_category_price ON products (category, price);
+
+DROP INDEX idx_products_price ON products;
+CREATE INDEX idx_products_price ON products (price);
+
+DROP INDEX idx_products_name ON products;
+CREATE INDEX idx_products_name ON products (name);
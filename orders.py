@@ -0,0 +1,131 @@
+from datetime import datetime
+
+from sales_rollup import move_order
+
+
+def attach_order_details(cur, orders):
+    """Agrega order['details'] a cada orden con una sola consulta.
+
+    Trae los renglones de todas las órdenes con un IN (...) y los reparte en
+    una pasada, en lugar de una consulta por orden.
+    """
+    if not orders:
+        return orders
+
+    by_order = {order['id']: [] for order in orders}
+    for order in orders:
+        order['details'] = by_order[order['id']]
+
+    ids = list(by_order)
+    placeholders = ', '.join(['%s'] * len(ids))
+    cur.execute(f"""
+        SELECT od.*, p.name as product_name
+        FROM order_details od
+        JOIN products p ON od.product_id = p.id
+        WHERE od.order_id IN ({placeholders})
+        ORDER BY od.order_id, od.id
+    """, ids)
+    for detail in cur.fetchall():
+        by_order[detail['order_id']].append(detail)
+    return orders
+
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+_CURSOR_FORMAT = '%Y%m%d%H%M%S'
+
+
+def page_size(value):
+    """Convierte el parámetro per_page a un tamaño dentro de los límites."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(order):
+    return f"{order['created_at'].strftime(_CURSOR_FORMAT)}_{order['id']}"
+
+
+def decode_cursor(cursor):
+    """Devuelve (created_at, id) o None si el cursor no es válido."""
+    try:
+        stamp, oid = cursor.split('_', 1)
+        return datetime.strptime(stamp, _CURSOR_FORMAT), int(oid)
+    except (AttributeError, ValueError):
+        return None
+
+
+def fetch_orders_page(cur, select_sql, conditions=(), params=(), cursor=None,
+                      direction='next', per_page=DEFAULT_PAGE_SIZE):
+    """Pagina órdenes por llave (created_at, id), de la más reciente a la más vieja.
+
+    select_sql es el SELECT ... FROM con el alias `om` para orders_master;
+    conditions y params son los filtros adicionales. En vez de OFFSET se
+    continúa desde la última fila vista, así que cada página cuesta lo mismo
+    sin importar cuántas órdenes haya antes.
+
+    Devuelve {'orders', 'next_cursor', 'prev_cursor', 'per_page'}.
+    """
+    conditions = list(conditions)
+    params = list(params)
+    position = decode_cursor(cursor) if cursor else None
+    backwards = position is not None and direction == 'prev'
+
+    if position is not None:
+        created_at, oid = position
+        op = '>' if backwards else '<'
+        conditions.append(f"(om.created_at {op} %s OR (om.created_at = %s AND om.id {op} %s))")
+        params.extend([created_at, created_at, oid])
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    order = 'ASC' if backwards else 'DESC'
+    cur.execute(f"""
+        {select_sql}
+        {where}
+        ORDER BY om.created_at {order}, om.id {order}
+        LIMIT %s
+    """, params + [per_page + 1])
+    rows = list(cur.fetchall())
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards:
+            # Veníamos de una página más vieja, así que siempre hay siguiente
+            next_cursor = encode_cursor(rows[-1])
+            prev_cursor = encode_cursor(rows[0]) if has_more else None
+        else:
+            next_cursor = encode_cursor(rows[-1]) if has_more else None
+            prev_cursor = encode_cursor(rows[0]) if position is not None else None
+
+    return {
+        'orders': rows,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'per_page': per_page,
+    }
+
+
+def set_order_status(cur, order_id, status):
+    """Cambia el estado de una orden y mueve su importe en daily_sales.
+
+    Devuelve False si la orden no existe.
+    """
+    cur.execute("""
+        SELECT id, status, payment_method, total_amount, created_at
+        FROM orders_master
+        WHERE id = %s
+        FOR UPDATE
+    """, (order_id,))
+    order = cur.fetchone()
+    if not order:
+        return False
+    cur.execute("UPDATE orders_master SET status = %s WHERE id = %s", (status, order_id))
+    move_order(cur, order, status)
+    return True
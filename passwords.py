@@ -0,0 +1,102 @@
+"""Hash y verificación de contraseñas fuera del hilo de la petición.
+
+scrypt usa mucha CPU y memoria a propósito; calcularlo dentro del worker de
+gunicorn lo bloquea y una ráfaga de logins deja sin servicio al resto de
+rutas. Aquí el trabajo va a un pool de procesos acotado, con un límite de
+trabajos en espera: si se llena, se rechaza de inmediato con ServiceBusy en
+lugar de encolar sin fin.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class ServiceBusy(Exception):
+    """El pool de hash está saturado; el cliente debe reintentar."""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(hashed, password):
+    return check_password_hash(hashed, password)
+
+
+def _method_string(method):
+    """El prefijo que Werkzeug escribe en el hash para method, con sus valores por defecto."""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = map(int, args) if args else (2**15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Método de hash no soportado: {method}")
+
+
+class PasswordService:
+
+    def __init__(self, method='scrypt', max_workers=2, max_pending=16, timeout=10):
+        self.method = method
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._current_method = _method_string(method)
+
+    def _get_executor(self):
+        # Un pool por proceso: los workers de gunicorn no heredan el del maestro
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # El worker ya corre hilos (auditoría, reservas, métricas); con fork un
+                # hijo podría heredar un candado tomado y colgarse
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context(method))
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusy("Demasiadas solicitudes de autenticación")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # El lugar se libera cuando el trabajo termina, no cuando la petición deja de esperar
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Se descarta si sigue en cola; si el pool ya lo tomó, termina en segundo plano
+            future.cancel()
+            raise
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, hashed, password):
+        if not hashed:
+            return False
+        return self._run(_verify, hashed, password)
+
+    def needs_rehash(self, hashed):
+        """True si el hash se generó con un método o parámetros distintos a los actuales."""
+        return hashed.split('$', 1)[0] != self._current_method
+
+
+def service_from_env():
+    return PasswordService(
+        method=os.getenv('PASSWORD_HASH_METHOD', 'scrypt'),
+        max_workers=int(os.getenv('PASSWORD_WORKERS', '2')),
+        max_pending=int(os.getenv('PASSWORD_MAX_PENDING', '16')),
+        timeout=int(os.getenv('PASSWORD_TIMEOUT', '10')),
+    )
@@ -0,0 +1,148 @@
+"""Reporte de pedidos en PDF con WeasyPrint.
+
+El HTML se arma en la petición (necesita el contexto de Flask), pero la
+conversión a PDF, que es lo costoso, corre en un pool de procesos para que
+no ocupe el GIL del worker de gunicorn. El hilo de la petición sí espera el
+resultado (hasta timeout segundos); los demás hilos del worker siguen
+atendiendo. Los trabajos en curso o en espera están acotados: si se llena,
+se rechaza de inmediato con ReportBusy. Un trabajo que excede el timeout no
+se puede interrumpir y sigue ocupando su lugar hasta terminar.
+
+Cada PDF se guarda en disco con una llave formada por el rango de fechas,
+los filtros y una marca de versión de los datos tomada de daily_sales:
+mientras los pedidos del rango no cambien, las descargas repetidas salen
+directo del disco.
+"""
+import glob
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+MAX_ROWS = 5000
+
+
+class ReportBusy(Exception):
+    """Hay demasiados PDF en proceso; el cliente debe reintentar."""
+
+
+def _render_pdf(html, base_url):
+    # Se importa en el proceso hijo: WeasyPrint es pesado y opcional
+    from weasyprint import HTML
+    return HTML(string=html, base_url=base_url).write_pdf()
+
+
+def data_version(cur, window):
+    """Marca que cambia cada vez que se crea o cambia de estado un pedido del rango.
+
+    Lleva los conteos por estado: un cambio de estado mueve un pedido de una
+    fila a otra sin alterar los totales del rango.
+    """
+    cur.execute("""
+        SELECT status, MAX(updated_at) AS changed, SUM(orders_count) AS orders,
+               SUM(total_amount) AS total
+        FROM daily_sales
+        WHERE sale_date >= %s AND sale_date < %s
+        GROUP BY status
+        ORDER BY status
+    """, (window.start.date(), window.end.date()))
+    return '|'.join(f"{row['status']}:{row['orders']}:{row['total']}:{row['changed']}"
+                    for row in cur.fetchall())
+
+
+def fetch_report_rows(cur, window, statuses=None):
+    date_filter, params = window.predicate('om.created_at')
+    params = list(params)
+    status_filter = ''
+    if statuses:
+        status_filter = f"AND om.status IN ({', '.join(['%s'] * len(statuses))})"
+        params.extend(statuses)
+    cur.execute(f"""
+        SELECT om.id, om.created_at, u.name as cliente, om.total_amount as total,
+               om.payment_method, om.status
+        FROM orders_master om
+        JOIN users u ON om.user_id = u.id
+        WHERE {date_filter} {status_filter}
+        ORDER BY om.created_at, om.id
+        LIMIT %s
+    """, params + [MAX_ROWS + 1])
+    rows = cur.fetchall()
+    return rows[:MAX_ROWS], len(rows) > MAX_ROWS
+
+
+class PDFReportCache:
+
+    def __init__(self, directory, timeout=60, max_workers=2, max_pending=4):
+        self.directory = directory
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_executor(self):
+        # Un pool por proceso: los workers de gunicorn no heredan el del maestro
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Sin fork: los hijos no deben copiar los hilos de fondo del worker ni sus candados
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context(method))
+                self._pid = os.getpid()
+            return self._executor
+
+    def _render(self, html, base_url):
+        if not self._slots.acquire(blocking=False):
+            raise ReportBusy("Demasiados reportes PDF en proceso")
+        try:
+            future = self._get_executor().submit(_render_pdf, html, base_url)
+        except Exception:
+            self._slots.release()
+            raise
+        # El lugar se libera cuando el trabajo termina, no cuando la petición deja de esperar
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Se descarta si sigue en cola; si el pool ya lo tomó, termina en segundo plano
+            future.cancel()
+            raise
+
+    def _prefix(self, window, statuses):
+        filters = hashlib.sha1('|'.join(sorted(statuses or [])).encode()).hexdigest()[:8]
+        return f"{window.start:%Y%m%d}_{window.last_day:%Y%m%d}_{filters}"
+
+    def path_for(self, window, statuses, version):
+        stamp = hashlib.sha1(version.encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{self._prefix(window, statuses)}_{stamp}.pdf")
+
+    def get_or_render(self, window, statuses, version, build_html, base_url):
+        """Devuelve la ruta del PDF, generándolo solo si no está en caché.
+
+        build_html se llama únicamente cuando hay que renderizar.
+        """
+        path = self.path_for(window, statuses, version)
+        if os.path.exists(path):
+            return path
+
+        html = build_html()
+        pdf = self._render(html, base_url)
+
+        # Escritura atómica: otro worker puede estar sirviendo el mismo archivo
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf)
+        os.replace(tmp, path)
+
+        # Las versiones anteriores del mismo rango ya no sirven
+        for old in glob.glob(os.path.join(self.directory, self._prefix(window, statuses) + '_*.pdf')):
+            if old != path:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        return path
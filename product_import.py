@@ -0,0 +1,367 @@
+"""Importación y exportación masiva del catálogo en CSV o JSONL.
+
+Cada fila se identifica por su sku (columna única, ver
+migrations/005_products_sku.sql): si el sku ya existe se actualiza el
+producto y si no se crea. Las filas válidas se escriben en lotes con
+INSERT ... ON DUPLICATE KEY UPDATE, un lote por transacción; las inválidas
+se reportan con su número de línea sin detener la importación. Las columnas
+ausentes o vacías no modifican el producto existente.
+
+El stock del archivo es el que hay en bodega; como products.stock es el
+disponible (ver reservations.py), al guardarlo se le restan las unidades
+apartadas en carritos, y la exportación vuelve a sumarlas. Si en bodega
+quedan menos unidades que las apartadas, las reservas sobrantes se recortan
+en la misma transacción para no vender lo que no existe.
+
+    python product_import.py import proveedor.csv
+    python product_import.py import proveedor.jsonl --chunk-size 2000
+    python product_import.py export catalogo.csv
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from decimal import Decimal, InvalidOperation
+
+import pymysql
+
+import reservations
+
+FIELDS = ('sku', 'name', 'category', 'description', 'price', 'stock', 'image')
+REQUIRED = ('sku', 'name', 'category', 'price')
+MAX_LENGTHS = {'sku': 64, 'name': 100, 'category': 50, 'image': 255}
+MAX_PRICE = Decimal('99999999.99')
+
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 1000
+# Solo se guarda el detalle de las primeras; el resto solo se cuenta
+MAX_REPORTED_ERRORS = 500
+
+
+def detect_format(filename, default='csv'):
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    if ext == '.csv':
+        return 'csv'
+    return default
+
+
+# --- Lectura y validación ---
+
+def read_rows(stream, fmt):
+    """Genera (número de línea, fila, error) desde un flujo de texto."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except ValueError as e:
+            yield line_no, None, f"JSON inválido: {str(e)}"
+
+
+def validate_row(row):
+    """Devuelve {campo: valor} listo para la base; lanza ValueError si la fila no sirve."""
+    if not isinstance(row, dict):
+        raise ValueError("la fila debe ser un objeto")
+    values = {}
+    for field in FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            if field in REQUIRED:
+                raise ValueError(f"falta {field}")
+            continue
+        values[field] = value
+
+    for field, limit in MAX_LENGTHS.items():
+        if field in values:
+            values[field] = str(values[field])
+            if len(values[field]) > limit:
+                raise ValueError(f"{field} excede {limit} caracteres")
+
+    try:
+        price = Decimal(str(values['price'])).quantize(Decimal('0.01'))
+        # NaN/sNaN pasan quantize y recién fallan al comparar; Infinity lanza aquí
+        valid = price.is_finite()
+        in_range = valid and 0 <= price <= MAX_PRICE
+    except InvalidOperation:
+        raise ValueError(f"precio inválido: {values['price']!r}")
+    if not valid:
+        raise ValueError(f"precio inválido: {values['price']!r}")
+    if not in_range:
+        raise ValueError(f"precio fuera de rango: {price}")
+    values['price'] = price
+
+    if 'stock' in values:
+        try:
+            stock = int(str(values['stock']))
+        except ValueError:
+            raise ValueError(f"stock inválido: {values['stock']!r}")
+        if stock < 0:
+            raise ValueError("stock negativo")
+        values['stock'] = stock
+
+    if 'description' in values:
+        values['description'] = str(values['description'])
+    return values
+
+
+# --- Escritura ---
+
+def _upsert_sql(columns):
+    updates = ', '.join(f"{c} = VALUES({c})" for c in columns if c != 'sku')
+    return f"""
+        INSERT INTO products ({', '.join(columns)})
+        VALUES ({', '.join(['%s'] * len(columns))})
+        ON DUPLICATE KEY UPDATE {updates}
+    """
+
+
+def _held_by_sku(cur, skus):
+    """Devuelve ({sku existente: id}, {sku: unidades apartadas}).
+
+    Las reservas quedan bloqueadas hasta el commit para que ningún carrito
+    aparte stock entre la lectura y el UPDATE; se toman antes que los
+    productos, como en reservations.py.
+    """
+    cur.execute(f"""
+        SELECT id, sku FROM products WHERE sku IN ({', '.join(['%s'] * len(skus))})
+    """, skus)
+    ids = {row['sku']: row['id'] for row in cur.fetchall()}
+    if not ids:
+        return ids, {}
+    skus_by_id = {pid: sku for sku, pid in ids.items()}
+    product_ids = sorted(skus_by_id)
+    cur.execute(f"""
+        SELECT product_id, SUM(quantity) AS held
+        FROM reservations
+        WHERE product_id IN ({', '.join(['%s'] * len(product_ids))})
+        GROUP BY product_id
+        FOR UPDATE
+    """, product_ids)
+    return ids, {skus_by_id[row['product_id']]: int(row['held']) for row in cur.fetchall()}
+
+
+def _fit_holds(cur, groups, ids, held):
+    """Recorta las reservas de los productos cuyo stock nuevo no las cubre.
+
+    Actualiza held con lo que queda apartado y devuelve las unidades recortadas.
+    """
+    # El stock que queda es el de la última fila de cada sku, en orden de escritura
+    final = {}
+    for columns, rows in groups.items():
+        if 'stock' in columns:
+            for _, values in rows:
+                final[values['sku']] = values['stock']
+    trimmed = 0
+    for sku, stock in sorted(final.items(), key=lambda item: ids.get(item[0], 0)):
+        excess = held.get(sku, 0) - stock
+        if excess > 0:
+            removed = reservations.trim(cur, ids[sku], excess)
+            held[sku] -= removed
+            trimmed += removed
+    return trimmed
+
+
+def _row_params(columns, values, held):
+    params = [values[c] for c in columns]
+    if 'stock' in columns:
+        i = columns.index('stock')
+        params[i] = params[i] - held.get(values['sku'], 0)
+    return params
+
+
+def _write_chunk(conn, chunk, summary):
+    """Escribe un lote en una transacción; si falla, fila por fila para ubicar el error."""
+    # Filas agrupadas por columnas presentes: una sentencia por grupo
+    groups = {}
+    for line_no, values in chunk:
+        groups.setdefault(tuple(f for f in FIELDS if f in values), []).append((line_no, values))
+    skus = list({values['sku'] for _, values in chunk})
+
+    try:
+        with conn.cursor() as cur:
+            existing, held = _held_by_sku(cur, skus)
+            trimmed = _fit_holds(cur, groups, existing, held)
+            for columns, rows in groups.items():
+                cur.executemany(_upsert_sql(columns),
+                                [_row_params(columns, values, held) for _, values in rows])
+        conn.commit()
+    except pymysql.MySQLError:
+        conn.rollback()
+        return _write_rows(conn, groups, summary)
+
+    summary['inserted'] += len(set(skus) - set(existing))
+    summary['updated'] += len(existing)
+    summary['holds_trimmed'] += trimmed
+    return True
+
+
+def _write_rows(conn, groups, summary):
+    for columns, rows in groups.items():
+        sql = _upsert_sql(columns)
+        for line_no, values in rows:
+            try:
+                with conn.cursor() as cur:
+                    ids, held = _held_by_sku(cur, [values['sku']])
+                    trimmed = _fit_holds(cur, {columns: [(line_no, values)]}, ids, held)
+                    cur.execute(sql, _row_params(columns, values, held))
+                    # 1 = insertado, 2 = actualizado, 0 = sin cambios
+                    affected = cur.rowcount
+                conn.commit()
+            except pymysql.MySQLError as e:
+                conn.rollback()
+                _add_error(summary, line_no, str(e))
+                continue
+            summary['inserted' if affected == 1 else 'updated'] += 1
+            summary['holds_trimmed'] += trimmed
+    return False
+
+
+def _add_error(summary, line_no, message):
+    summary['error_count'] += 1
+    if len(summary['errors']) < MAX_REPORTED_ERRORS:
+        summary['errors'].append({'line': line_no, 'error': message})
+
+
+def import_products(conn, stream, fmt='csv', chunk_size=CHUNK_SIZE):
+    """Importa el flujo de texto stream; devuelve un resumen con los errores por fila."""
+    summary = {
+        'rows': 0,
+        'inserted': 0,
+        'updated': 0,
+        'chunks': 0,
+        'holds_trimmed': 0,
+        'error_count': 0,
+        'errors': [],
+    }
+    chunk = []
+    for line_no, row, error in read_rows(stream, fmt):
+        summary['rows'] += 1
+        if error is None:
+            try:
+                chunk.append((line_no, validate_row(row)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            _add_error(summary, line_no, error)
+        if len(chunk) >= chunk_size:
+            _write_chunk(conn, chunk, summary)
+            summary['chunks'] += 1
+            chunk = []
+    if chunk:
+        _write_chunk(conn, chunk, summary)
+        summary['chunks'] += 1
+    return summary
+
+
+# --- Exportación ---
+
+def export_products(conn, fmt='csv', chunk_rows=CHUNK_SIZE):
+    """Genera el catálogo en bloques de bytes con un cursor sin búfer.
+
+    El stock exportado es el de bodega (disponible + apartado), el mismo que
+    espera import_products.
+    """
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=FIELDS, extrasaction='ignore')
+        writer.writeheader()
+
+    with conn.cursor(pymysql.cursors.SSDictCursor) as cur:
+        # SUM() devuelve DECIMAL, que json.dumps no acepta
+        columns = ', '.join('CAST(p.stock + COALESCE(h.held, 0) AS SIGNED) AS stock'
+                            if f == 'stock' else f'p.{f}' for f in FIELDS)
+        cur.execute(f"""
+            SELECT {columns}
+            FROM products p
+            LEFT JOIN (
+                SELECT product_id, SUM(quantity) AS held
+                FROM reservations
+                GROUP BY product_id
+            ) h ON h.product_id = p.id
+            ORDER BY p.id
+        """)
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            for row in rows:
+                row['price'] = str(row['price'])
+                if writer is not None:
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(row, ensure_ascii=False) + '\n')
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        # Catálogo vacío: solo el encabezado del CSV
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_products(pool, fmt='csv'):
+    """Como export_products, con una conexión del pool reservada mientras dura la descarga."""
+    conn = pool.acquire()
+    try:
+        yield from export_products(conn, fmt)
+    finally:
+        conn.release()
+
+
+def main(argv):
+    from migrate import get_connection
+
+    parser = argparse.ArgumentParser(description="Importación y exportación masiva de productos")
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help="crear o actualizar productos por sku")
+    imp.add_argument('path')
+    imp.add_argument('--format', choices=FORMATS, help="por defecto según la extensión")
+    imp.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    exp = sub.add_parser('export', help="volcar el catálogo completo")
+    exp.add_argument('path')
+    exp.add_argument('--format', choices=FORMATS, help="por defecto según la extensión")
+    args = parser.parse_args(argv)
+    fmt = args.format or detect_format(args.path)
+
+    conn = get_connection()
+    try:
+        if args.command == 'export':
+            with open(args.path, 'wb') as f:
+                for block in export_products(conn, fmt):
+                    f.write(block)
+            print(f"Catálogo exportado a {args.path}")
+            return 0
+
+        with open(args.path, 'r', encoding='utf-8-sig', newline='') as f:
+            summary = import_products(conn, f, fmt, chunk_size=args.chunk_size)
+        for error in summary['errors']:
+            print(f"Línea {error['line']}: {error['error']}")
+        if summary['error_count'] > len(summary['errors']):
+            print(f"... y {summary['error_count'] - len(summary['errors'])} errores más")
+        print(f"Filas: {summary['rows']}, creadas: {summary['inserted']}, "
+              f"actualizadas: {summary['updated']}, con error: {summary['error_count']}")
+        if summary['holds_trimmed']:
+            print(f"Unidades apartadas recortadas por falta de stock: {summary['holds_trimmed']}")
+        return 1 if summary['error_count'] else 0
+    except Exception as e:
+        print(f"Error en {args.command}: {str(e)}")
+        conn.rollback()
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,205 @@
+"""Instrumentación de las consultas que hace cada petición.
+
+get_db() envuelve la conexión del pool en InstrumentedConnection; cada
+execute()/executemany() de sus cursores se cronometra y se suma a la
+RequestQueries de la petición (cantidad, tiempo total y la más lenta).
+Al terminar la petición QueryMonitor:
+
+- agrega el encabezado Server-Timing (db y app) a la respuesta,
+- escribe en el log las sentencias que pasaron de slow_ms, con el SQL
+  normalizado (literales y listas IN reemplazados por ?),
+- guarda la petición en un histograma por ruta de las últimas N
+  peticiones, visible en /admin/queries.
+
+Los datos son por proceso: con varios workers de gunicorn cada uno muestra
+solo lo que atendió.
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# Límites superiores (ms) de las barras del histograma de tiempo en base de datos
+DB_TIME_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|%\(\w+\)s')
+_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_ROWS_RE = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """SQL sin valores concretos, para agrupar sentencias iguales en el log."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _LIST_RE.sub('(...)', sql)
+    sql = _ROWS_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class RequestQueries:
+    """Acumulado de consultas de una petición."""
+
+    __slots__ = ('count', 'seconds', 'slowest_seconds', 'slowest_sql', 'slow')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_sql = None
+        self.slow = []
+
+    def record(self, sql, seconds, slow_seconds):
+        self.count += 1
+        self.seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_sql = sql
+        if seconds >= slow_seconds:
+            self.slow.append((sql, seconds))
+
+
+class InstrumentedCursor:
+
+    def __init__(self, cursor, queries, slow_seconds):
+        self._cursor = cursor
+        self._queries = queries
+        self._slow_seconds = slow_seconds
+
+    def __getattr__(self, name):
+        # fetchall(), rowcount, lastrowid, etc. van directo al cursor real
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, method, sql, args):
+        started = time.perf_counter()
+        try:
+            return method(sql, args)
+        finally:
+            self._queries.record(sql, time.perf_counter() - started, self._slow_seconds)
+
+    def execute(self, sql, args=None):
+        return self._timed(self._cursor.execute, sql, args)
+
+    def executemany(self, sql, args):
+        return self._timed(self._cursor.executemany, sql, args)
+
+
+class InstrumentedConnection:
+    """Conexión del pool cuyos cursores cuentan y cronometran las consultas."""
+
+    def __init__(self, conn, queries, slow_seconds):
+        self._conn = conn
+        self._queries = queries
+        self._slow_seconds = slow_seconds
+
+    def __getattr__(self, name):
+        # commit(), rollback(), release(), close() de la conexión del pool
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._queries,
+                                  self._slow_seconds)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class QueryMonitor:
+
+    def __init__(self, slow_ms=200, history=500):
+        self.slow_seconds = slow_ms / 1000.0
+        self.history = history
+        # ruta -> deque de (consultas, ms en db, ms totales, ms y SQL de la más lenta)
+        self._routes = {}
+        self._slow_log = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def start_request(self):
+        return RequestQueries()
+
+    def wrap(self, conn, queries):
+        return InstrumentedConnection(conn, queries, self.slow_seconds)
+
+    def finish_request(self, route, queries, elapsed):
+        """Registra la petición terminada; devuelve el valor de Server-Timing."""
+        db_ms = queries.seconds * 1000
+        total_ms = elapsed * 1000
+        for sql, seconds in queries.slow:
+            normalized = normalize_sql(sql)
+            print(f"Consulta lenta ({seconds * 1000:.1f} ms) en {route}: {normalized}")
+            self._slow_log.append({
+                'route': route,
+                'ms': round(seconds * 1000, 1),
+                'sql': normalized,
+                'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            })
+
+        with self._lock:
+            samples = self._routes.get(route)
+            if samples is None:
+                samples = self._routes[route] = deque(maxlen=self.history)
+            samples.append((queries.count, db_ms, total_ms,
+                            queries.slowest_seconds * 1000, queries.slowest_sql))
+
+        return (f'db;dur={db_ms:.1f};desc="{queries.count} consultas", '
+                f'app;dur={total_ms:.1f}')
+
+    def routes(self):
+        """Resumen por ruta para la página de administración."""
+        with self._lock:
+            snapshot = {route: list(samples) for route, samples in self._routes.items()}
+
+        summary = []
+        for route, samples in snapshot.items():
+            counts = [s[0] for s in samples]
+            db_times = [s[1] for s in samples]
+            totals = [s[2] for s in samples]
+            buckets = [0] * (len(DB_TIME_BUCKETS_MS) + 1)
+            for ms in db_times:
+                for i, limit in enumerate(DB_TIME_BUCKETS_MS):
+                    if ms <= limit:
+                        buckets[i] += 1
+                        break
+                else:
+                    buckets[-1] += 1
+            slow = max(samples, key=lambda s: s[3])
+            summary.append({
+                'route': route,
+                'requests': len(samples),
+                'queries_avg': round(sum(counts) / len(counts), 1),
+                'queries_max': max(counts),
+                'db_p50': round(_percentile(db_times, 0.5), 1),
+                'db_p95': round(_percentile(db_times, 0.95), 1),
+                'total_p95': round(_percentile(totals, 0.95), 1),
+                'buckets': buckets,
+                'slowest_ms': round(slow[3], 1) if slow[4] else None,
+                'slowest_sql': normalize_sql(slow[4]) if slow[4] else None,
+            })
+        summary.sort(key=lambda r: r['db_p95'], reverse=True)
+        return summary
+
+    def slow_queries(self):
+        return list(reversed(self._slow_log))
+
+
+def monitor_from_env():
+    return QueryMonitor(
+        slow_ms=float(os.getenv('SLOW_QUERY_MS', '200')),
+        history=int(os.getenv('QUERY_STATS_HISTORY', '500')),
+    )
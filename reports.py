@@ -0,0 +1,60 @@
+import csv
+import io
+
+import pymysql
+
+REPORT_COLUMNS = ['Fecha', 'Cliente', 'Total', 'Método de Pago', 'Estado']
+CHUNK_ROWS = 500
+
+
+def _order_filters(window, statuses):
+    date_filter, params = window.predicate('om.created_at')
+    conditions = [date_filter]
+    params = list(params)
+    if statuses:
+        conditions.append(f"om.status IN ({', '.join(['%s'] * len(statuses))})")
+        params.extend(statuses)
+    return ' AND '.join(conditions), params
+
+
+def stream_orders_csv(pool, window, statuses=None, chunk_rows=CHUNK_ROWS):
+    """Genera el reporte de pedidos en CSV por bloques de chunk_rows filas.
+
+    Usa un cursor sin búfer (SSDictCursor): las filas llegan de MySQL a
+    medida que se escriben, así que la memoria no depende del tamaño del
+    rango. La conexión se toma del pool solo para el reporte, porque queda
+    ocupada hasta leer la última fila.
+    """
+    where, params = _order_filters(window, statuses)
+    conn = pool.acquire()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(REPORT_COLUMNS)
+
+        with conn.cursor(pymysql.cursors.SSDictCursor) as cur:
+            cur.execute(f"""
+                SELECT om.created_at, u.name as cliente, om.total_amount as total,
+                       om.payment_method, om.status
+                FROM orders_master om
+                JOIN users u ON om.user_id = u.id
+                WHERE {where}
+                ORDER BY om.created_at, om.id
+            """, params)
+            # El encabezado sale antes de leer la primera fila
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                for o in rows:
+                    writer.writerow([o['created_at'], o['cliente'], o['total'],
+                                     o['payment_method'], o['status']])
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+    finally:
+        conn.release()
@@ -0,0 +1,270 @@
+"""Reservas de stock con vencimiento para los carritos.
+
+Al agregar un producto al carrito se aparta el stock de inmediato con un
+descuento condicional (UPDATE ... WHERE stock >= cantidad) y se anota la
+reserva en la tabla reservations. products.stock es entonces el stock
+disponible, sin lo apartado: quien lo fije desde fuera (product_import.py)
+debe restar las reservas abiertas. Cada reserva renueva el plazo de todo el
+carrito del usuario; las vencidas se devuelven al stock en lote con
+sweep_expired(), que corre en un hilo de fondo (ReservationSweeper) o con:
+
+    python reservations.py sweep
+
+En el checkout, place_order() convierte las reservas del usuario en venta
+y solo toca el stock por la diferencia con el carrito.
+
+Todas las funciones toman primero las filas de reservations y después las
+de products, en orden de id, para que no se crucen los candados.
+"""
+import argparse
+import os
+import sys
+import threading
+
+
+class ReservationError(Exception):
+    """No hay stock disponible para apartar."""
+
+
+def reserve(cur, user_id, product_id, quantity=1, ttl=900):
+    """Aparta quantity unidades para el usuario; lanza ReservationError si no alcanzan.
+
+    Debe llamarse dentro de una transacción; ante el error el llamador hace
+    rollback.
+    """
+    cur.execute("""
+        INSERT INTO reservations (user_id, product_id, quantity, expires_at)
+        VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND)
+        ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
+    """, (user_id, product_id, quantity, ttl))
+    cur.execute("""
+        UPDATE reservations
+        SET expires_at = NOW() + INTERVAL %s SECOND
+        WHERE user_id = %s
+    """, (ttl, user_id))
+    cur.execute("""
+        UPDATE products
+        SET stock = stock - %s
+        WHERE id = %s AND stock >= %s
+    """, (quantity, product_id, quantity))
+    if cur.rowcount != 1:
+        raise ReservationError("No hay stock disponible de este producto")
+
+
+def _restock(cur, totals):
+    """Devuelve al stock {product_id: cantidad} en un solo UPDATE."""
+    ids = sorted(pid for pid, qty in totals.items() if qty)
+    if not ids:
+        return
+    cases = ' '.join(['WHEN %s THEN %s'] * len(ids))
+    params = []
+    for pid in ids:
+        params.extend([pid, totals[pid]])
+    placeholders = ', '.join(['%s'] * len(ids))
+    cur.execute(f"""
+        UPDATE products
+        SET stock = stock + CASE id {cases} END
+        WHERE id IN ({placeholders})
+    """, params + ids)
+
+
+def claim(cur, user_id):
+    """Bloquea y borra las reservas del usuario; devuelve {product_id: cantidad}.
+
+    Las reservas vencidas que aún no se barrieron también cuentan: su stock
+    sigue apartado.
+    """
+    cur.execute("""
+        SELECT product_id, quantity
+        FROM reservations
+        WHERE user_id = %s
+        FOR UPDATE
+    """, (user_id,))
+    holds = {row['product_id']: row['quantity'] for row in cur.fetchall()}
+    if holds:
+        cur.execute("DELETE FROM reservations WHERE user_id = %s", (user_id,))
+    return holds
+
+
+def release(cur, user_id, product_ids=None):
+    """Libera las reservas del usuario (todas o las de product_ids)."""
+    if product_ids is None:
+        _restock(cur, claim(cur, user_id))
+        return
+    product_ids = sorted(product_ids)
+    if not product_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    cur.execute(f"""
+        SELECT product_id, quantity
+        FROM reservations
+        WHERE user_id = %s AND product_id IN ({placeholders})
+        FOR UPDATE
+    """, [user_id] + product_ids)
+    holds = {row['product_id']: row['quantity'] for row in cur.fetchall()}
+    if holds:
+        cur.execute(f"""
+            DELETE FROM reservations
+            WHERE user_id = %s AND product_id IN ({placeholders})
+        """, [user_id] + product_ids)
+    _restock(cur, holds)
+
+
+def trim(cur, product_id, quantity):
+    """Quita quantity unidades apartadas de product_id sin devolverlas al stock.
+
+    Para cuando el stock de bodega bajó de lo apartado (p. ej. una
+    importación): se recortan primero las reservas más próximas a vencer.
+    Devuelve cuántas unidades recortó.
+    """
+    cur.execute("""
+        SELECT user_id, quantity
+        FROM reservations
+        WHERE product_id = %s
+        ORDER BY expires_at, user_id
+        FOR UPDATE
+    """, (product_id,))
+    trimmed = 0
+    for row in cur.fetchall():
+        if trimmed >= quantity:
+            break
+        take = min(quantity - trimmed, row['quantity'])
+        if take == row['quantity']:
+            cur.execute("DELETE FROM reservations WHERE user_id = %s AND product_id = %s",
+                        (row['user_id'], product_id))
+        else:
+            cur.execute("""
+                UPDATE reservations SET quantity = quantity - %s
+                WHERE user_id = %s AND product_id = %s
+            """, (take, row['user_id'], product_id))
+        trimmed += take
+    return trimmed
+
+
+def sweep_expired(cur, limit=500):
+    """Devuelve al stock hasta limit reservas vencidas; retorna cuántas liberó.
+
+    SKIP LOCKED deja pasar las filas que otro proceso está barriendo o que un
+    checkout está convirtiendo en venta.
+    """
+    cur.execute("""
+        SELECT user_id, product_id, quantity
+        FROM reservations
+        WHERE expires_at < NOW()
+        ORDER BY expires_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """, (limit,))
+    rows = cur.fetchall()
+    if not rows:
+        return 0
+
+    pairs = ', '.join(['(%s, %s)'] * len(rows))
+    params = []
+    totals = {}
+    for row in rows:
+        params.extend([row['user_id'], row['product_id']])
+        totals[row['product_id']] = totals.get(row['product_id'], 0) + row['quantity']
+    cur.execute(f"""
+        DELETE FROM reservations
+        WHERE (user_id, product_id) IN ({pairs})
+    """, params)
+    _restock(cur, totals)
+    return len(rows)
+
+
+def sweep_all(conn, batch_size=500):
+    """Barre todas las reservas vencidas, un lote por transacción."""
+    released = 0
+    while True:
+        with conn.cursor() as cur:
+            count = sweep_expired(cur, batch_size)
+        conn.commit()
+        released += count
+        if count < batch_size:
+            return released
+
+
+class ReservationSweeper:
+    """Hilo de fondo que libera las reservas vencidas cada interval segundos."""
+
+    def __init__(self, pool, interval=30, batch_size=500):
+        self.pool = pool
+        self.interval = interval
+        self.batch_size = batch_size
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.released = 0
+        self.errors = 0
+
+    def ensure_started(self):
+        # Se arranca en el primer uso de cada proceso (después del fork de gunicorn)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='reservation-sweeper', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sweep()
+
+    def sweep(self):
+        try:
+            conn = self.pool.acquire()
+            try:
+                released = sweep_all(conn, self.batch_size)
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.release()
+        except Exception as e:
+            self.errors += 1
+            print("Error liberando reservas vencidas:", str(e))
+            return 0
+        self.released += released
+        return released
+
+    def stop(self):
+        self._stop.set()
+
+
+def sweeper_from_env(pool):
+    return ReservationSweeper(
+        pool,
+        interval=int(os.getenv('RESERVATION_SWEEP_INTERVAL', '30')),
+        batch_size=int(os.getenv('RESERVATION_SWEEP_BATCH', '500')),
+    )
+
+
+def main(argv):
+    from migrate import get_connection
+
+    parser = argparse.ArgumentParser(description="Mantenimiento de reservas de stock")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sweep = sub.add_parser('sweep', help="devolver al stock las reservas vencidas")
+    sweep.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        released = sweep_all(conn, args.batch_size)
+        print(f"Reservas liberadas: {released}")
+        return 0
+    except Exception as e:
+        print(f"Error liberando reservas: {str(e)}")
+        conn.rollback()
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
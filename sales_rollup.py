@@ -0,0 +1,116 @@
+"""Mantenimiento de la tabla daily_sales (ventas por día, método y estado).
+
+Las funciones record_order y move_order se llaman dentro de la transacción
+que crea o modifica la orden, así el resumen nunca se desfasa del detalle.
+
+Para reconstruir el resumen a partir del historial:
+
+    python sales_rollup.py backfill [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--chunk-days N]
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+
+def record_order(cur, order_id):
+    """Suma una orden recién creada a su renglón del día."""
+    cur.execute("""
+        INSERT INTO daily_sales (sale_date, payment_method, status, orders_count, total_amount)
+        SELECT DATE(created_at), payment_method, status, 1, total_amount
+        FROM orders_master
+        WHERE id = %s
+        ON DUPLICATE KEY UPDATE
+            orders_count = orders_count + 1,
+            total_amount = total_amount + VALUES(total_amount)
+    """, (order_id,))
+
+
+def move_order(cur, order, new_status):
+    """Pasa una orden (ya bloqueada con FOR UPDATE) de su estado actual a new_status."""
+    if order['status'] == new_status:
+        return
+    sale_date = order['created_at'].date()
+    cur.execute("""
+        UPDATE daily_sales
+        SET orders_count = orders_count - 1,
+            total_amount = total_amount - %s
+        WHERE sale_date = %s AND payment_method = %s AND status = %s
+    """, (order['total_amount'], sale_date, order['payment_method'], order['status']))
+    cur.execute("""
+        INSERT INTO daily_sales (sale_date, payment_method, status, orders_count, total_amount)
+        VALUES (%s, %s, %s, 1, %s)
+        ON DUPLICATE KEY UPDATE
+            orders_count = orders_count + 1,
+            total_amount = total_amount + VALUES(total_amount)
+    """, (sale_date, order['payment_method'], new_status, order['total_amount']))
+
+
+def backfill(conn, start, end, chunk_days=31):
+    """Recalcula daily_sales para [start, end) en bloques de chunk_days días.
+
+    Cada bloque se borra y se vuelve a agregar en su propia transacción para
+    no mantener candados largos sobre orders_master.
+    """
+    rows = 0
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), end)
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM daily_sales WHERE sale_date >= %s AND sale_date < %s",
+                        (chunk_start, chunk_end))
+            cur.execute("""
+                INSERT INTO daily_sales (sale_date, payment_method, status, orders_count, total_amount)
+                SELECT DATE(created_at), payment_method, status, COUNT(*), SUM(total_amount)
+                FROM orders_master
+                WHERE created_at >= %s AND created_at < %s
+                GROUP BY DATE(created_at), payment_method, status
+            """, (datetime.combine(chunk_start, datetime.min.time()),
+                  datetime.combine(chunk_end, datetime.min.time())))
+            rows += cur.rowcount
+        conn.commit()
+        print(f"{chunk_start} - {chunk_end - timedelta(days=1)}: {cur.rowcount} renglones")
+        chunk_start = chunk_end
+    return rows
+
+
+def _history_bounds(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT MIN(created_at) AS first, MAX(created_at) AS last FROM orders_master")
+        row = cur.fetchone()
+    if not row or row['first'] is None:
+        return None, None
+    return row['first'].date(), row['last'].date() + timedelta(days=1)
+
+
+def main(argv):
+    from migrate import get_connection
+
+    parser = argparse.ArgumentParser(description="Mantenimiento de daily_sales")
+    sub = parser.add_subparsers(dest='command', required=True)
+    fill = sub.add_parser('backfill', help="reconstruir el resumen desde orders_master")
+    fill.add_argument('--start', help="primer día (YYYY-MM-DD); por defecto la primera orden")
+    fill.add_argument('--end', help="último día incluido (YYYY-MM-DD); por defecto la última orden")
+    fill.add_argument('--chunk-days', type=int, default=31)
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        first, last = _history_bounds(conn)
+        start = datetime.strptime(args.start, '%Y-%m-%d').date() if args.start else first
+        end = (datetime.strptime(args.end, '%Y-%m-%d').date() + timedelta(days=1)) if args.end else last
+        if start is None or end is None:
+            print("No hay órdenes para resumir")
+            return 0
+        total = backfill(conn, start, end, chunk_days=args.chunk_days)
+        print(f"Resumen reconstruido: {total} renglones")
+        return 0
+    except Exception as e:
+        print(f"Error al reconstruir daily_sales: {str(e)}")
+        conn.rollback()
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,262 @@
+"""Búsqueda de productos por nombre, categoría y descripción.
+
+Mantiene en memoria un índice invertido token -> {product_id: peso}. Los
+tokens se normalizan sin acentos ni mayúsculas ("Jabón" encuentra "jabon"),
+se quitan palabras vacías del español y cada término de la consulta puede
+ser prefijo ("can" encuentra "canela"). Mientras el índice no está listo se
+usa el índice FULLTEXT de MySQL (migrations/003_products_fulltext.sql).
+"""
+import bisect
+import os
+import re
+import threading
+import time
+import unicodedata
+
+STOPWORDS = {
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los',
+    'o', 'para', 'por', 'sin', 'su', 'un', 'una', 'unos', 'unas', 'y',
+}
+
+# Peso de cada campo en el puntaje
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'category': 2.0,
+    'description': 1.0,
+}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def _stem(token):
+    # Plurales simples: "galletas" -> "galleta", "panes" -> "pan"
+    if len(token) > 4 and token.endswith('es') and token[-3] not in 'aeiou':
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [_stem(t) for t in _TOKEN_RE.findall(normalize(text)) if t not in STOPWORDS]
+
+
+class SearchIndex:
+
+    def __init__(self):
+        self._postings = {}   # token -> {pid: peso}
+        self._docs = {}       # pid -> tokens del producto
+        self._names = {}      # pid -> nombre normalizado, para desempatar
+        self._vocab = []      # tokens ordenados para buscar prefijos
+        self._vocab_dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def build(self, products):
+        with self._lock:
+            self._postings.clear()
+            self._docs.clear()
+            self._names.clear()
+            for product in products:
+                self._add(product)
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+
+    def upsert(self, product):
+        with self._lock:
+            self._remove(product['id'])
+            self._add(product)
+            self._vocab_dirty = True
+
+    def remove(self, pid):
+        with self._lock:
+            self._remove(pid)
+            self._vocab_dirty = True
+
+    def _add(self, product):
+        pid = product['id']
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(product.get(field)):
+                weights[token] = weights.get(token, 0) + weight
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[pid] = weight
+        self._docs[pid] = list(weights)
+        self._names[pid] = normalize(product.get('name'))
+
+    def _remove(self, pid):
+        for token in self._docs.pop(pid, []):
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(pid, None)
+                if not posting:
+                    del self._postings[token]
+        self._names.pop(pid, None)
+
+    def _expand(self, term):
+        """Tokens del vocabulario que empiezan con term."""
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        start = bisect.bisect_left(self._vocab, term)
+        matches = []
+        for token in self._vocab[start:]:
+            if not token.startswith(term):
+                break
+            matches.append(token)
+        return matches
+
+    def search(self, query):
+        """Devuelve los ids ordenados por relevancia; todos los términos deben aparecer."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            expanded = [(term, self._expand(term)) for term in terms]
+            # Empezar por el término más selectivo para que la intersección sea chica
+            expanded.sort(key=lambda item: sum(len(self._postings[t]) for t in item[1]))
+
+            scores = None
+            for term, tokens in expanded:
+                postings = [(self._postings[token], 1.0 if token == term else 0.5)
+                            for token in tokens]
+                term_scores = {}
+                if scores is None:
+                    for posting, factor in postings:
+                        for pid, weight in posting.items():
+                            term_scores[pid] = max(term_scores.get(pid, 0), weight * factor)
+                else:
+                    for pid in scores:
+                        for posting, factor in postings:
+                            weight = posting.get(pid)
+                            if weight is not None:
+                                term_scores[pid] = max(term_scores.get(pid, 0), weight * factor)
+                        if pid in term_scores:
+                            term_scores[pid] += scores[pid]
+                scores = term_scores
+                if not scores:
+                    return []
+            return sorted(scores, key=lambda pid: (-scores[pid], self._names.get(pid, '')))
+
+
+class ProductSearch:
+    """Índice en memoria reconstruido en segundo plano, con respaldo FULLTEXT.
+
+    Un hilo por proceso (arrancado en el primer uso, después del fork de
+    gunicorn) arma un índice nuevo aparte cada rebuild_interval segundos, para
+    ver los cambios hechos en otros workers, y lo intercambia por el actual:
+    ninguna búsqueda espera la reconstrucción. Mientras no hay índice se usa
+    FULLTEXT. upsert() actualiza el índice al momento cuando este proceso
+    crea o modifica productos.
+    """
+
+    def __init__(self, get_db, pool, rebuild_interval=300):
+        self._get_db = get_db
+        self.pool = pool
+        self.rebuild_interval = rebuild_interval
+        self.index = None
+        self._built_at = None
+        self._lock = threading.Lock()
+        # Cambios hechos mientras se arma un índice nuevo, para aplicarlos antes del cambio
+        self._pending = None
+        self._thread = None
+        self._pid = None
+        self._wake = threading.Event()
+        self.errors = 0
+
+    def ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.index = None
+            self._built_at = None
+            self._wake = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='search-rebuild', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.rebuild()
+            self._wake.wait(self.rebuild_interval)
+            self._wake.clear()
+
+    def rebuild(self):
+        """Arma un índice nuevo desde la base y lo pone en lugar del actual."""
+        with self._lock:
+            self._pending = []
+        try:
+            conn = self.pool.acquire()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT id, name, category, description FROM products")
+                    rows = cur.fetchall()
+            finally:
+                conn.release()
+            index = SearchIndex()
+            index.build(rows)
+        except Exception as e:
+            self.errors += 1
+            print("Error construyendo índice de búsqueda:", str(e))
+            with self._lock:
+                self._pending = None
+            return False
+
+        with self._lock:
+            for product in self._pending:
+                index.upsert(product)
+            self._pending = None
+            self.index = index
+            self._built_at = time.monotonic()
+        return True
+
+    def upsert(self, product):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(product)
+            index = self.index
+        if index is not None:
+            index.upsert(product)
+
+    def invalidate(self):
+        """Pide una reconstrucción inmediata (p. ej. tras una importación)."""
+        self._wake.set()
+
+    def search_ids(self, query):
+        """Ids por relevancia; puede lanzar la excepción de la base si se usa FULLTEXT."""
+        self.ensure_started()
+        index = self.index
+        if index is not None:
+            return index.search(query)
+        return self._fulltext(query)
+
+    def _fulltext(self, query):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        boolean_query = ' '.join(f"+{term}*" for term in terms)
+        conn = self._get_db()
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id
+                FROM products
+                WHERE MATCH(name, category, description) AGAINST (%s IN BOOLEAN MODE)
+                ORDER BY MATCH(name, category, description) AGAINST (%s IN BOOLEAN MODE) DESC, name
+                LIMIT 1000
+            """, (boolean_query, boolean_query))
+            return [row['id'] for row in cur.fetchall()]
+
+    def search(self, query, page=1, per_page=24):
+        """Devuelve (ids de la página, total de coincidencias)."""
+        ids = self.search_ids(query)
+        start = (max(page, 1) - 1) * per_page
+        return ids[start:start + per_page], len(ids)
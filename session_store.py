@@ -0,0 +1,281 @@
+"""Sesiones del lado del servidor para Flask.
+
+La cookie solo lleva un id opaco y firmado; el contenido de la sesión
+(carrito, usuario, mensajes flash) vive en un backend intercambiable:
+
+- MemoryBackend: LRU en memoria, para un solo proceso (desarrollo).
+- SQLiteBackend: archivo compartido por los workers de una misma máquina.
+- MySQLBackend: tabla `sessions`, compartida por todos los servidores.
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Asigna un id nuevo (p. ej. al iniciar sesión) y descarta el anterior."""
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = _new_sid()
+        self.modified = True
+
+
+def _new_sid():
+    return secrets.token_urlsafe(32)
+
+
+def regenerate(session):
+    # Con la sesión en cookie de Flask no hay id que rotar
+    if isinstance(session, ServerSession):
+        session.regenerate()
+
+
+class MemoryBackend:
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            payload, expires = entry
+            if expires < time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return payload
+
+    def save(self, sid, payload, expires):
+        with self._lock:
+            self._data[sid] = (payload, expires)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def cleanup(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, exp) in self._data.items() if exp < now]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+
+class SQLiteBackend:
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+
+    def _conn(self):
+        # Una conexión por hilo y por proceso (los forks de gunicorn no la comparten)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid):
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE id = ? AND expires_at >= ?",
+            (sid, time.time())).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, payload, expires):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)",
+                         (sid, payload, expires))
+
+    def delete(self, sid):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+    def cleanup(self):
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+
+
+class MySQLBackend:
+    """Usa la tabla `sessions` de db_schema.sql a través del pool."""
+
+    def __init__(self, pool, cleanup_batch=5000):
+        self.pool = pool
+        self.cleanup_batch = cleanup_batch
+
+    def _run(self, sql, params, fetch=False):
+        conn = self.pool.acquire()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                result = cur.fetchone() if fetch else cur.rowcount
+            conn.commit()
+            return result
+        finally:
+            conn.release()
+
+    def load(self, sid):
+        row = self._run("SELECT data FROM sessions WHERE id = %s AND expires_at >= NOW()",
+                        (sid,), fetch=True)
+        return row['data'] if row else None
+
+    def save(self, sid, payload, expires):
+        self._run("""
+            INSERT INTO sessions (id, data, expires_at)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE data = VALUES(data), expires_at = VALUES(expires_at)
+        """, (sid, payload, datetime.fromtimestamp(expires)))
+
+    def delete(self, sid):
+        self._run("DELETE FROM sessions WHERE id = %s", (sid,))
+
+    def cleanup(self):
+        # Borrar por lotes para no mantener candados largos sobre la tabla
+        total = 0
+        while True:
+            deleted = self._run("DELETE FROM sessions WHERE expires_at < NOW() LIMIT %s",
+                                (self.cleanup_batch,))
+            total += deleted
+            if deleted < self.cleanup_batch:
+                return total
+
+
+class ServerSideSessionInterface(SessionInterface):
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, backend, gc_interval=300):
+        self.backend = backend
+        self.gc_interval = gc_interval
+        self._last_gc = time.monotonic()
+        self._gc_lock = threading.Lock()
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='server-session')
+
+    def _lifetime(self, app, session):
+        if session.permanent:
+            return app.permanent_session_lifetime
+        # Las sesiones de navegador igual expiran en el servidor
+        return min(app.permanent_session_lifetime, timedelta(days=1))
+
+    def _maybe_collect(self):
+        now = time.monotonic()
+        if now - self._last_gc < self.gc_interval or not self._gc_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_gc = now
+            self.backend.cleanup()
+        except Exception as e:
+            print("Error limpiando sesiones:", str(e))
+        finally:
+            self._gc_lock.release()
+
+    def open_session(self, app, request):
+        self._maybe_collect()
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                payload = self.backend.load(sid)
+                if payload is not None:
+                    return ServerSession(self.serializer.loads(payload), sid=sid)
+        return ServerSession(sid=_new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid:
+            self.backend.delete(session.previous_sid)
+            session.previous_sid = None
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = self._lifetime(app, session)
+        if session.modified or self.should_set_cookie(app, session):
+            payload = self.serializer.dumps(dict(session))
+            self.backend.save(session.sid, payload, time.time() + lifetime.total_seconds())
+
+        if session.new or session.modified or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid.encode()).decode(),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+        response.vary.add('Cookie')
+
+
+def session_interface_from_env(pool):
+    """Elige el backend según SESSION_BACKEND (cookie, memory, sqlite, mysql).
+
+    Por defecto cookie, que funciona con cualquier número de workers de
+    gunicorn; memory es solo para desarrollo con un proceso.
+    """
+    kind = os.getenv('SESSION_BACKEND', 'cookie').lower()
+    gc_interval = int(os.getenv('SESSION_GC_INTERVAL', '300'))
+    if kind == 'cookie':
+        return None
+    if kind == 'memory':
+        backend = MemoryBackend(max_entries=int(os.getenv('SESSION_MEMORY_MAX', '10000')))
+    elif kind == 'sqlite':
+        backend = SQLiteBackend(os.getenv('SESSION_SQLITE_PATH', os.path.join('instance', 'sessions.sqlite3')))
+    elif kind == 'mysql':
+        backend = MySQLBackend(pool)
+    else:
+        raise ValueError(f"SESSION_BACKEND desconocido: {kind}")
+    return ServerSideSessionInterface(backend, gc_interval=gc_interval)
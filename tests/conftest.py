@@ -0,0 +1,77 @@
+"""Dobles de prueba compartidos: cursor y conexión sin MySQL."""
+import re
+
+import pytest
+
+
+class FakeCursor:
+    """Cursor que anota cada consulta y devuelve resultados preparados.
+
+    results es una cola: cada fetchone()/fetchall() toma el siguiente
+    elemento. rowcount vale 1 salvo que se encolen valores en rowcounts.
+    """
+
+    def __init__(self, results=None, rowcounts=None):
+        self.results = list(results or [])
+        self.rowcounts = list(rowcounts or [])
+        self.executed = []
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append((' '.join(sql.split()), params))
+        self.rowcount = self.rowcounts.pop(0) if self.rowcounts else 1
+
+    def executemany(self, sql, seq):
+        for params in seq:
+            self.execute(sql, params)
+
+    def fetchall(self):
+        return self.results.pop(0) if self.results else []
+
+    def fetchone(self):
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def statements(self, pattern):
+        """Las consultas ejecutadas que coinciden con pattern (regex)."""
+        return [(sql, params) for sql, params in self.executed if re.search(pattern, sql)]
+
+
+class FakeConnection:
+
+    def __init__(self, cursor=None):
+        self._cursor = cursor or FakeCursor()
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+        self.pings = 0
+        self.ping_error = None
+
+    def cursor(self, *args):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.ping_error:
+            raise self.ping_error
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def cursor():
+    return FakeCursor()
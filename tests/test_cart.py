@@ -0,0 +1,80 @@
+import pytest
+
+import cart
+from cart import CartFullError
+
+
+class Session(dict):
+    modified = False
+
+
+class Catalog:
+
+    def __init__(self, products):
+        self.products = products
+
+    def get_product(self, pid):
+        return self.products.get(pid)
+
+
+def test_load_cart_converts_keys():
+    assert cart.load_cart({'cart': {'3': 2, '7': '1'}}) == {3: 2, 7: 1}
+
+
+def test_load_cart_migrates_list_format():
+    session = {'cart': [{'id': 3}, {'id': '3'}, {'id': 5}]}
+    assert cart.load_cart(session) == {3: 2, 5: 1}
+
+
+def test_load_cart_empty():
+    assert cart.load_cart({}) == {}
+
+
+def test_save_cart_drops_zero_quantities():
+    session = Session()
+    cart.save_cart(session, {1: 2, 2: 0})
+    assert session['cart'] == {'1': 2}
+    assert session.modified
+
+
+def test_add_and_remove_item():
+    session = Session()
+    cart.add_item(session, 4)
+    cart.add_item(session, 4, quantity=2)
+    assert cart.item_count(session) == 3
+    assert cart.remove_item(session, 4) == {}
+    assert cart.item_count(session) == 0
+
+
+def test_check_add_limits_lines(monkeypatch):
+    monkeypatch.setattr(cart, 'MAX_LINES', 2)
+    full = {1: 1, 2: 1}
+    with pytest.raises(CartFullError):
+        cart.check_add(full, 3)
+    # Sumar a un producto que ya está no agrega renglones
+    cart.check_add(full, 1)
+
+
+def test_check_add_limits_quantity():
+    with pytest.raises(CartFullError):
+        cart.check_add({1: cart.MAX_QUANTITY}, 1)
+    with pytest.raises(CartFullError, match="3 unidades"):
+        cart.check_add({1: 2}, 1, quantity=2, available=3)
+    cart.check_add({1: 2}, 1, quantity=1, available=3)
+
+
+def test_posted_prices_skips_missing_and_invalid():
+    form = {'price_1': '5.99', 'price_2': 'abc', 'price_9': '1.00'}
+    assert cart.posted_prices(form, {1: 1, 2: 1, 3: 1}) == {1: 5.99}
+
+
+def test_resolve_cart_totals_and_removed():
+    catalog = Catalog({
+        1: {'name': 'Canela', 'price': '5.50', 'stock': 10},
+        2: {'name': 'Té', 'price': 2, 'stock': 0},
+    })
+    items, total, removed = cart.resolve_cart({1: 2, 2: 1, 3: 4}, catalog)
+    assert [item['id'] for item in items] == [1, 2]
+    assert items[0]['subtotal'] == 11.0
+    assert total == 13.0
+    assert removed == [3]
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+import pytest
+
+from checkout import CheckoutError, OutOfStock, place_order, valid_checkout_token
+
+from conftest import FakeCursor
+
+PRODUCTS = [
+    {'id': 1, 'name': 'Canela', 'price': Decimal('5.00')},
+    {'id': 2, 'name': 'Clavo', 'price': Decimal('3.00')},
+]
+
+
+def checkout_cursor(holds, stock):
+    cur = FakeCursor(results=[
+        PRODUCTS,
+        [{'product_id': pid, 'quantity': qty} for pid, qty in holds.items()],
+        [{'id': pid, 'stock': qty} for pid, qty in stock.items()],
+    ])
+    cur.lastrowid = 99
+    return cur
+
+
+def stock_update(cur):
+    updates = cur.statements(r'^UPDATE products SET stock = stock - CASE')
+    return updates[0][1] if updates else None
+
+
+def test_only_the_difference_with_the_holds_touches_stock():
+    cur = checkout_cursor(holds={1: 2, 2: 3}, stock={1: 10, 2: 10})
+    order_id, total = place_order(cur, 7, {1: 3, 2: 1}, 'Efectivo', 'Calle 1')
+    assert (order_id, total) == (99, Decimal('18.00'))
+    # 1: una más que lo reservado; 2: dos menos, se devuelven
+    assert stock_update(cur) == [1, 1, 2, -2, 1, 2]
+
+
+def test_fully_reserved_cart_does_not_lock_products():
+    cur = checkout_cursor(holds={1: 2}, stock={})
+    place_order(cur, 7, {1: 2}, 'Efectivo', 'Calle 1')
+    assert not cur.statements(r'FROM products .*FOR UPDATE')
+    assert stock_update(cur) is None
+
+
+def test_holds_for_products_no_longer_in_the_cart_are_returned():
+    cur = checkout_cursor(holds={1: 1, 2: 2}, stock={2: 0})
+    place_order(cur, 7, {1: 1}, 'Efectivo', 'Calle 1')
+    assert stock_update(cur) == [2, -2, 2]
+
+
+def test_out_of_stock_names_the_product():
+    cur = checkout_cursor(holds={}, stock={1: 5, 2: 0})
+    with pytest.raises(OutOfStock, match='Clavo'):
+        place_order(cur, 7, {1: 1, 2: 1}, 'Efectivo', 'Calle 1')
+    assert stock_update(cur) is None
+
+
+def test_changed_price_is_rejected_before_writing():
+    cur = checkout_cursor(holds={}, stock={})
+    with pytest.raises(CheckoutError, match='precio'):
+        place_order(cur, 7, {1: 1}, 'Efectivo', 'Calle 1', expected_prices={1: 4.5})
+    assert not cur.statements(r'^INSERT')
+
+
+def test_missing_product_and_empty_cart():
+    cur = checkout_cursor(holds={}, stock={})
+    with pytest.raises(CheckoutError, match='no encontrado'):
+        place_order(cur, 7, {3: 1}, 'Efectivo', 'Calle 1')
+    with pytest.raises(CheckoutError):
+        place_order(FakeCursor(), 7, {}, 'Efectivo', 'Calle 1')
+
+
+def test_details_and_rollup_are_written():
+    cur = checkout_cursor(holds={1: 2}, stock={})
+    place_order(cur, 7, {1: 2}, 'Efectivo', 'Calle 1', checkout_token='a' * 32)
+    assert cur.statements(r'^INSERT INTO orders_master')[0][1][-1] == 'a' * 32
+    assert cur.statements(r'^INSERT INTO order_details')[0][1] == (99, 1, 2, Decimal('5.00'), Decimal('10.00'))
+    assert cur.statements(r'^INSERT INTO daily_sales')[0][1] == (99,)
+
+
+def test_valid_checkout_token():
+    assert valid_checkout_token('0' * 32) == '0' * 32
+    assert valid_checkout_token('xyz') is None
+    assert valid_checkout_token(None) is None
@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+
+import db_pool
+from db_pool import ConnectionPool, PoolTimeout
+
+from conftest import FakeConnection
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def connect(**kwargs):
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(db_pool.pymysql, 'connect', connect)
+    return opened
+
+
+def make_pool(**kwargs):
+    options = dict(min_size=1, max_size=2, max_overflow=1, recycle=3600, timeout=0, pre_ping=True)
+    options.update(kwargs)
+    return ConnectionPool({}, **options)
+
+
+def test_warm_up_opens_min_size(connections):
+    pool = make_pool(min_size=2, max_size=3)
+    conn = pool.acquire()
+    assert len(connections) == 2
+    assert pool.stats()['in_use'] == 1
+    conn.release()
+    assert pool.stats()['idle'] == 2
+
+
+def test_release_rolls_back_and_reuses(connections):
+    pool = make_pool()
+    conn = pool.acquire()
+    conn.release()
+    assert connections[0].rollbacks == 1
+    assert pool.acquire() is conn
+    assert len(connections) == 1
+
+
+def test_overflow_connections_are_closed_on_release(connections):
+    pool = make_pool(min_size=0, max_size=1, max_overflow=1)
+    first, second = pool.acquire(), pool.acquire()
+    assert pool.stats()['open'] == 2
+    first.release()
+    second.release()
+    stats = pool.stats()
+    assert stats['open'] == 1 and stats['idle'] == 1
+    assert connections[1].closed
+
+
+def test_exhausted_pool_times_out(connections):
+    pool = make_pool(min_size=0, max_size=1, max_overflow=0, timeout=0)
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_waiter_gets_released_connection(connections):
+    pool = make_pool(min_size=0, max_size=1, max_overflow=0, timeout=5)
+    conn = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    conn.release()
+    waiter.join(timeout=5)
+    assert got == [conn]
+
+
+def test_stale_connection_is_recycled(connections):
+    pool = make_pool(recycle=10)
+    conn = pool.acquire()
+    conn.release()
+    conn.created_at -= 11
+    fresh = pool.acquire()
+    assert fresh is not conn
+    assert connections[0].closed
+    assert pool.stats()['recycled'] == 1
+
+
+def test_failed_ping_replaces_connection(connections):
+    pool = make_pool()
+    conn = pool.acquire()
+    conn.release()
+    connections[0].ping_error = OSError("gone")
+    fresh = pool.acquire()
+    assert fresh.raw is connections[1]
+    assert pool.stats()['ping_failures'] == 1
+
+
+def test_unhealthy_connection_is_discarded(connections):
+    pool = make_pool()
+    conn = pool.acquire()
+
+    def broken():
+        raise OSError("lost")
+
+    connections[0].rollback = broken
+    conn.release()
+    stats = pool.stats()
+    assert stats['idle'] == 0 and stats['open'] == 0
+
+
+def test_failed_connect_frees_the_slot(connections, monkeypatch):
+    pool = make_pool(min_size=0, max_size=1, max_overflow=0)
+
+    def refuse(**kwargs):
+        raise OSError("refused")
+
+    monkeypatch.setattr(db_pool.pymysql, 'connect', refuse)
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.stats()['open'] == 0 and pool.stats()['in_use'] == 0
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        ConnectionPool({}, min_size=3, max_size=2)
@@ -0,0 +1,128 @@
+import json
+import os
+
+import pytest
+
+import metrics
+from metrics import MetricsRegistry
+
+
+def snapshot(counter, gauge):
+    return {
+        'requests_total': {'type': 'counter', 'help': 'Peticiones', 'labelnames': ['route'],
+                           'buckets': [], 'values': [[['home'], counter]]},
+        'in_flight': {'type': 'gauge', 'help': 'En curso', 'labelnames': [],
+                      'buckets': [], 'values': [[[], gauge]]},
+    }
+
+
+def write(directory, pid, data):
+    with open(os.path.join(directory, f'metrics-{pid}.json'), 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def test_counter_and_gauge_rendering():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Peticiones', ('route',))
+    in_flight = registry.gauge('in_flight', 'En curso')
+    requests.inc(route='home')
+    requests.inc(2, route='cart')
+    in_flight.inc()
+    in_flight.dec()
+    assert registry.exposition() == (
+        '# HELP in_flight En curso\n'
+        '# TYPE in_flight gauge\n'
+        'in_flight 0\n'
+        '# HELP requests_total Peticiones\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{route="cart"} 2\n'
+        'requests_total{route="home"} 1\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Latencia', buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        latency.observe(value)
+    lines = registry.exposition().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum 4.05' in lines
+    assert 'latency_seconds_count 4' in lines
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter('errors_total', 'Errores', ('message',)).inc(message='a "b"\nc\\')
+    assert 'errors_total{message="a \\"b\\"\\nc\\\\"} 1' in registry.exposition()
+
+
+def test_labels_must_match():
+    registry = MetricsRegistry()
+    counter = registry.counter('requests_total', 'Peticiones', ('route',))
+    with pytest.raises(ValueError):
+        counter.inc(method='GET')
+
+
+def test_collectors_run_before_exposition():
+    registry = MetricsRegistry()
+    hits = registry.counter('cache_hits_total', 'Aciertos')
+
+    @registry.collect
+    def copy_hits():
+        hits.set_total(42)
+
+    assert 'cache_hits_total 42' in registry.exposition()
+
+
+def test_merge_adds_counters_and_histograms():
+    merged = {}
+    metrics._merge(merged, snapshot(2, 1))
+    metrics._merge(merged, snapshot(3, 5), gauges=False)
+    assert merged['requests_total']['values'] == {('home',): 5}
+    assert merged['in_flight']['values'] == {(): 1}
+
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    # Pids de prueba: 1 vive (init), 999999 no
+    monkeypatch.setattr(metrics, '_pid_alive', lambda pid: pid == 1)
+    return str(tmp_path)
+
+
+def test_dead_workers_count_without_their_gauges(directory):
+    write(directory, 1, snapshot(2, 3))
+    write(directory, 999999, snapshot(5, 7))
+    registry = MetricsRegistry(directory, flush_interval=3600)
+    text = registry.exposition()
+    assert 'requests_total{route="home"} 7' in text
+    assert 'in_flight 3' in text
+
+
+def test_startup_folds_dead_and_recycled_pid_files(directory):
+    write(directory, 1, snapshot(2, 3))
+    write(directory, 999999, snapshot(5, 7))
+    # Archivo de un proceso anterior que tuvo el mismo pid que este
+    write(directory, os.getpid(), snapshot(4, 1))
+    registry = MetricsRegistry(directory, flush_interval=3600)
+    registry.counter('requests_total', 'Peticiones', ('route',)).inc(route='home')
+
+    text = registry.exposition()
+    assert 'requests_total{route="home"} 12' in text
+    assert sorted(os.listdir(directory)) == ['.lock', 'aggregate.json', 'metrics-1.json',
+                                             f'metrics-{os.getpid()}.json']
+    with open(os.path.join(directory, 'aggregate.json'), encoding='utf-8') as f:
+        aggregate = json.load(f)
+    assert aggregate['requests_total']['values'] == [[['home'], 9]]
+    assert 'in_flight' not in aggregate
+
+
+def test_fold_adds_to_the_existing_aggregate(directory):
+    write(directory, 999999, snapshot(5, 7))
+    MetricsRegistry(directory)._fold_dead()
+    write(directory, 999998, snapshot(1, 0))
+    MetricsRegistry(directory)._fold_dead()
+    with open(os.path.join(directory, 'aggregate.json'), encoding='utf-8') as f:
+        assert json.load(f)['requests_total']['values'] == [[['home'], 6]]
@@ -0,0 +1,109 @@
+import io
+from decimal import Decimal
+
+import pytest
+
+import product_import
+from product_import import detect_format, import_products, read_rows, validate_row
+
+from conftest import FakeConnection, FakeCursor
+
+ROW = {'sku': ' P1 ', 'name': 'Canela', 'category': 'Especias', 'price': '5.999'}
+
+
+def test_detect_format():
+    assert detect_format('proveedor.CSV') == 'csv'
+    assert detect_format('proveedor.ndjson') == 'jsonl'
+    assert detect_format('proveedor.txt') == 'csv'
+    assert detect_format(None, default='jsonl') == 'jsonl'
+
+
+def test_read_rows_csv_line_numbers():
+    stream = io.StringIO("sku,name\nP1,Canela\nP2,Clavo\n")
+    assert [(n, r['sku'], e) for n, r, e in read_rows(stream, 'csv')] == [(2, 'P1', None), (3, 'P2', None)]
+
+
+def test_read_rows_jsonl_reports_bad_lines():
+    stream = io.StringIO('{"sku": "P1"}\n\n{roto\n')
+    rows = list(read_rows(stream, 'jsonl'))
+    assert rows[0] == (1, {'sku': 'P1'}, None)
+    assert rows[1][0] == 3 and rows[1][1] is None and rows[1][2].startswith('JSON inválido')
+
+
+def test_validate_row_normalizes_values():
+    values = validate_row(dict(ROW, stock='7', description=12))
+    assert values['sku'] == 'P1'
+    assert values['price'] == Decimal('6.00')
+    assert values['stock'] == 7
+    assert values['description'] == '12'
+
+
+def test_validate_row_skips_blank_optional_fields():
+    values = validate_row(dict(ROW, stock='', image='  '))
+    assert 'stock' not in values and 'image' not in values
+
+
+@pytest.mark.parametrize('changes, message', [
+    ({'name': ''}, 'falta name'),
+    ({'sku': None}, 'falta sku'),
+    ({'name': 'x' * 101}, 'name excede 100'),
+    ({'price': 'abc'}, 'precio inválido'),
+    ({'price': 'NaN'}, 'precio inválido'),
+    ({'price': 'Infinity'}, 'precio inválido'),
+    ({'price': '-1'}, 'precio fuera de rango'),
+    ({'price': '100000000'}, 'precio fuera de rango'),
+    ({'stock': '2.5'}, 'stock inválido'),
+    ({'stock': '-3'}, 'stock negativo'),
+])
+def test_validate_row_rejects(changes, message):
+    with pytest.raises(ValueError, match=message):
+        validate_row(dict(ROW, **changes))
+
+
+def test_validate_row_rejects_non_objects():
+    with pytest.raises(ValueError):
+        validate_row(['P1'])
+
+
+def test_row_params_subtracts_held_units():
+    columns = ('sku', 'name', 'stock')
+    values = {'sku': 'P1', 'name': 'Canela', 'stock': 10}
+    assert product_import._row_params(columns, values, {'P1': 4}) == ['P1', 'Canela', 6]
+    assert product_import._row_params(('sku', 'name'), values, {'P1': 4}) == ['P1', 'Canela']
+
+
+def test_import_counts_inserted_updated_and_errors():
+    cur = FakeCursor(results=[
+        [{'id': 10, 'sku': 'P1'}],                # skus existentes
+        [{'product_id': 10, 'held': 2}],          # reservas abiertas
+    ])
+    conn = FakeConnection(cur)
+    stream = io.StringIO(
+        "sku,name,category,price,stock\n"
+        "P1,Canela,Especias,5,8\n"
+        "P2,Clavo,Especias,3,4\n"
+        "P3,,Especias,1,1\n"
+    )
+    summary = import_products(conn, stream)
+    assert (summary['rows'], summary['inserted'], summary['updated']) == (3, 1, 1)
+    assert summary['errors'] == [{'line': 4, 'error': 'falta name'}]
+    assert conn.commits == 1
+    upserts = cur.statements(r'^INSERT INTO products')
+    # El stock guardado es el disponible: 8 en bodega menos 2 apartadas
+    assert [params[-1] for _, params in upserts] == [6, 4]
+
+
+def test_import_trims_holds_above_the_new_stock():
+    cur = FakeCursor(results=[
+        [{'id': 10, 'sku': 'P1'}],
+        [{'product_id': 10, 'held': 5}],
+        [{'user_id': 1, 'quantity': 3}, {'user_id': 2, 'quantity': 2}],  # reservations.trim
+    ])
+    conn = FakeConnection(cur)
+    stream = io.StringIO('{"sku": "P1", "name": "Canela", "category": "Especias", "price": 5, "stock": 1}\n')
+    summary = import_products(conn, stream, 'jsonl')
+    assert summary['holds_trimmed'] == 4
+    assert cur.statements(r'^DELETE FROM reservations')[0][1] == (1, 10)
+    assert cur.statements(r'^UPDATE reservations SET quantity')[0][1] == (1, 2, 10)
+    upsert = cur.statements(r'^INSERT INTO products')[0]
+    assert upsert[1][-1] == 0
@@ -0,0 +1,82 @@
+import pytest
+
+import reservations
+from reservations import ReservationError
+
+from conftest import FakeConnection, FakeCursor
+
+
+def test_reserve_takes_stock_conditionally():
+    cur = FakeCursor()
+    reservations.reserve(cur, 7, 3, quantity=2, ttl=60)
+    sql, params = cur.statements(r'^UPDATE products')[0]
+    assert 'stock >= %s' in sql
+    assert params == (2, 3, 2)
+
+
+def test_reserve_without_stock_raises():
+    cur = FakeCursor(rowcounts=[1, 1, 0])
+    with pytest.raises(ReservationError):
+        reservations.reserve(cur, 7, 3)
+
+
+def test_claim_locks_and_deletes():
+    cur = FakeCursor(results=[[{'product_id': 1, 'quantity': 2}, {'product_id': 4, 'quantity': 1}]])
+    assert reservations.claim(cur, 7) == {1: 2, 4: 1}
+    assert cur.executed[0][0].endswith('FOR UPDATE')
+    assert cur.statements(r'^DELETE FROM reservations WHERE user_id')[0][1] == (7,)
+
+
+def test_claim_without_holds_deletes_nothing():
+    cur = FakeCursor(results=[[]])
+    assert reservations.claim(cur, 7) == {}
+    assert not cur.statements(r'^DELETE')
+
+
+def test_release_all_restocks_in_one_update():
+    cur = FakeCursor(results=[[{'product_id': 4, 'quantity': 1}, {'product_id': 1, 'quantity': 2}]])
+    reservations.release(cur, 7)
+    restock = cur.statements(r'^UPDATE products SET stock = stock \+ CASE')
+    assert len(restock) == 1
+    # Por id ascendente: primero los WHEN y luego la lista IN
+    assert restock[0][1] == [1, 2, 4, 1, 1, 4]
+
+
+def test_release_some_products():
+    cur = FakeCursor(results=[[{'product_id': 4, 'quantity': 3}]])
+    reservations.release(cur, 7, [9, 4])
+    select = cur.executed[0]
+    assert select[1] == [7, 4, 9]
+    assert cur.statements(r'^UPDATE products')[0][1] == [4, 3, 4]
+
+
+def test_sweep_expired_groups_quantities_by_product():
+    cur = FakeCursor(results=[[
+        {'user_id': 1, 'product_id': 5, 'quantity': 2},
+        {'user_id': 2, 'product_id': 5, 'quantity': 1},
+        {'user_id': 2, 'product_id': 3, 'quantity': 4},
+    ]])
+    assert reservations.sweep_expired(cur, limit=10) == 3
+    assert 'SKIP LOCKED' in cur.executed[0][0]
+    assert cur.statements(r'^DELETE FROM reservations')[0][1] == [1, 5, 2, 5, 2, 3]
+    assert cur.statements(r'^UPDATE products')[0][1] == [3, 4, 5, 3, 3, 5]
+
+
+def test_sweep_all_commits_one_batch_per_transaction():
+    rows = [{'user_id': i, 'product_id': 1, 'quantity': 1} for i in range(2)]
+    conn = FakeConnection(FakeCursor(results=[rows, rows[:1]]))
+    assert reservations.sweep_all(conn, batch_size=2) == 3
+    assert conn.commits == 2
+
+
+def test_trim_removes_soonest_to_expire_first():
+    cur = FakeCursor(results=[[{'user_id': 1, 'quantity': 2}, {'user_id': 2, 'quantity': 5}]])
+    assert reservations.trim(cur, 9, 4) == 4
+    assert cur.statements(r'^DELETE')[0][1] == (1, 9)
+    assert cur.statements(r'^UPDATE reservations')[0][1] == (2, 2, 9)
+    assert not cur.statements(r'^UPDATE products')
+
+
+def test_trim_stops_at_available_holds():
+    cur = FakeCursor(results=[[{'user_id': 1, 'quantity': 2}]])
+    assert reservations.trim(cur, 9, 10) == 2
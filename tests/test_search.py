@@ -0,0 +1,117 @@
+from search import ProductSearch, SearchIndex, normalize, tokenize
+
+from conftest import FakeConnection, FakeCursor
+
+PRODUCTS = [
+    {'id': 1, 'name': 'Canela en Polvo', 'category': 'Especias', 'description': 'Canela molida'},
+    {'id': 2, 'name': 'Galletas de Canela', 'category': 'Repostería', 'description': 'Artesanales'},
+    {'id': 3, 'name': 'Jabón de Avena', 'category': 'Higiene', 'description': 'Con aroma a canela'},
+]
+
+
+class FakePool:
+
+    def __init__(self, rows):
+        self.cursor = FakeCursor(results=[rows])
+        self.released = 0
+
+    def acquire(self):
+        conn = FakeConnection(self.cursor)
+        conn.release = self._release
+        return conn
+
+    def _release(self):
+        self.released += 1
+
+
+def test_normalize_strips_accents():
+    assert normalize('Jabón ÁRBOL') == 'jabon arbol'
+    assert normalize(None) == ''
+
+
+def test_tokenize_drops_stopwords_and_stems_plurals():
+    assert tokenize('Galletas de Canela') == ['galleta', 'canela']
+    assert tokenize('panes con miel') == ['pan', 'miel']
+    assert tokenize('la y el') == []
+
+
+def test_tokenize_keeps_double_s():
+    assert tokenize('express') == ['express']
+
+
+def build():
+    index = SearchIndex()
+    index.build(PRODUCTS)
+    return index
+
+
+def test_search_ranks_name_over_description():
+    assert build().search('canela') == [1, 2, 3]
+
+
+def test_search_matches_prefixes_and_accents():
+    index = build()
+    assert index.search('jabon') == [3]
+    assert index.search('gall') == [2]
+
+
+def test_search_requires_every_term():
+    index = build()
+    assert index.search('canela polvo') == [1]
+    assert index.search('canela chocolate') == []
+    assert index.search('de la') == []
+
+
+def test_upsert_and_remove():
+    index = build()
+    index.upsert({'id': 1, 'name': 'Clavo de Olor', 'category': 'Especias', 'description': ''})
+    assert 1 not in index.search('polvo')
+    assert index.search('clavo') == [1]
+    index.remove(2)
+    assert index.search('galleta') == []
+    assert len(index) == 2
+
+
+def test_rebuild_swaps_in_a_new_index():
+    pool = FakePool(PRODUCTS)
+    search = ProductSearch(get_db=None, pool=pool)
+    assert search.rebuild()
+    assert pool.released == 1
+    assert search.index.search('avena') == [3]
+
+
+def test_rebuild_replays_upserts_made_while_building():
+    pool = FakePool(PRODUCTS)
+    search = ProductSearch(get_db=None, pool=pool)
+    original_fetch = pool.cursor.fetchall
+
+    def fetch_and_upsert():
+        rows = original_fetch()
+        search.upsert({'id': 4, 'name': 'Té de Canela', 'category': 'Bebidas', 'description': ''})
+        return rows
+
+    pool.cursor.fetchall = fetch_and_upsert
+    search.rebuild()
+    assert search.index.search('te') == [4]
+
+
+def test_failed_rebuild_keeps_current_index():
+    search = ProductSearch(get_db=None, pool=FakePool(PRODUCTS))
+    search.rebuild()
+    index = search.index
+
+    class BrokenPool:
+        def acquire(self):
+            raise OSError("sin conexión")
+
+    search.pool = BrokenPool()
+    assert not search.rebuild()
+    assert search.index is index
+    assert search.errors == 1
+
+
+def test_fulltext_builds_a_boolean_prefix_query():
+    cur = FakeCursor(results=[[{'id': 2}]])
+    search = ProductSearch(get_db=lambda: FakeConnection(cur), pool=None)
+    assert search._fulltext('Galletas canela') == [2]
+    assert cur.executed[0][1] == ('+galleta* +canela*', '+galleta* +canela*')
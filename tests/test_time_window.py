@@ -0,0 +1,71 @@
+from datetime import date, datetime
+
+from time_window import TimeWindow, db_today, resolve_window, window_from_args
+
+from conftest import FakeCursor
+
+TODAY = date(2026, 3, 11)  # miércoles
+
+
+def test_today():
+    window = resolve_window('today', today=TODAY)
+    assert (window.start, window.end) == (datetime(2026, 3, 11), datetime(2026, 3, 12))
+    assert window.label == 'Hoy'
+
+
+def test_yesterday_crosses_month():
+    window = resolve_window('yesterday', today=date(2026, 3, 1))
+    assert (window.start, window.end) == (datetime(2026, 2, 28), datetime(2026, 3, 1))
+
+
+def test_week_starts_on_monday():
+    window = resolve_window('week', today=TODAY)
+    assert window.start == datetime(2026, 3, 9)
+    assert window.last_day == TODAY
+
+
+def test_month():
+    window = resolve_window('month', today=TODAY)
+    assert window.start == datetime(2026, 3, 1)
+    assert window.end == datetime(2026, 3, 12)
+
+
+def test_custom_swaps_reversed_dates():
+    window = resolve_window('custom', start=date(2026, 3, 5), end=date(2026, 3, 1), today=TODAY)
+    assert (window.start, window.last_day) == (datetime(2026, 3, 1), date(2026, 3, 5))
+    assert window.label == '01/03/2026 - 05/03/2026'
+
+
+def test_custom_without_start_falls_back_to_today():
+    window = resolve_window('custom', today=TODAY)
+    assert window.name == 'today'
+
+
+def test_unknown_range_is_today():
+    assert resolve_window('bogus', today=TODAY).name == 'today'
+
+
+def test_predicate_is_sargable():
+    window = TimeWindow(datetime(2026, 3, 1), datetime(2026, 3, 2))
+    sql, params = window.predicate('om.created_at')
+    assert sql == 'om.created_at >= %s AND om.created_at < %s'
+    assert params == (datetime(2026, 3, 1), datetime(2026, 3, 2))
+
+
+def test_as_args_round_trip():
+    window = resolve_window('custom', start=date(2026, 2, 1), end=date(2026, 2, 3), today=TODAY)
+    args = window.as_args()
+    assert args == {'range': 'custom', 'start': '2026-02-01', 'end': '2026-02-03'}
+    again = window_from_args(args, today=TODAY)
+    assert (again.start, again.end) == (window.start, window.end)
+
+
+def test_window_from_args_ignores_bad_dates():
+    window = window_from_args({'range': 'custom', 'start': '2026-13-40'}, today=TODAY)
+    assert window.name == 'today'
+
+
+def test_db_today_reads_the_database_clock():
+    cur = FakeCursor(results=[[{'today': TODAY}]])
+    assert db_today(cur) == TODAY
+    assert cur.executed[0][0] == 'SELECT CURDATE() AS today'
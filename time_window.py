@@ -0,0 +1,101 @@
+from datetime import date, datetime, time, timedelta
+
+RANGES = {
+    'today': 'Hoy',
+    'yesterday': 'Ayer',
+    'week': 'Esta semana',
+    'month': 'Este mes',
+    'custom': 'Personalizado',
+}
+
+
+class TimeWindow:
+    """Intervalo [start, end) para filtrar columnas de fecha con un rango.
+
+    Comparar la columna directamente (created_at >= start AND created_at < end)
+    permite usar el índice; DATE(created_at) = CURDATE() obliga a recorrer
+    toda la tabla.
+    """
+
+    def __init__(self, start, end, name='custom'):
+        self.start = start
+        self.end = end
+        self.name = name
+
+    @property
+    def last_day(self):
+        """Último día incluido en la ventana."""
+        return (self.end - timedelta(days=1)).date()
+
+    @property
+    def label(self):
+        if self.name == 'custom':
+            if self.last_day == self.start.date():
+                return self.start.strftime('%d/%m/%Y')
+            return f"{self.start:%d/%m/%Y} - {self.last_day:%d/%m/%Y}"
+        return RANGES[self.name]
+
+    def predicate(self, column):
+        """Devuelve (sql, params) listos para agregar a un WHERE."""
+        return f"{column} >= %s AND {column} < %s", (self.start, self.end)
+
+    def as_args(self):
+        """Parámetros de URL que reconstruyen esta ventana."""
+        if self.name != 'custom':
+            return {'range': self.name}
+        return {
+            'range': 'custom',
+            'start': self.start.strftime('%Y-%m-%d'),
+            'end': self.last_day.strftime('%Y-%m-%d'),
+        }
+
+
+def _midnight(day):
+    return datetime.combine(day, time.min)
+
+
+def db_today(cur):
+    """Fecha actual según el reloj de MySQL, el mismo que llena created_at."""
+    cur.execute("SELECT CURDATE() AS today")
+    return cur.fetchone()['today']
+
+
+def resolve_window(name='today', start=None, end=None, today=None):
+    """Crea la ventana para today, yesterday, week, month o custom.
+
+    En custom, start y end son fechas (date) inclusivas. today debe venir de
+    db_today(): el reloj del servidor de la aplicación puede estar en otra
+    zona horaria que el de MySQL y cerca de medianoche "hoy" no coincidiría
+    con created_at. Sin today se usa la fecha local.
+    """
+    today = today or date.today()
+    if name == 'yesterday':
+        first, last = today - timedelta(days=1), today - timedelta(days=1)
+    elif name == 'week':
+        first, last = today - timedelta(days=today.weekday()), today
+    elif name == 'month':
+        first, last = today.replace(day=1), today
+    elif name == 'custom' and start:
+        first, last = start, end or start
+        if last < first:
+            first, last = last, first
+    else:
+        name, first, last = 'today', today, today
+    return TimeWindow(_midnight(first), _midnight(last + timedelta(days=1)), name)
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def window_from_args(args, default='today', today=None):
+    """Lee ?range=...&start=YYYY-MM-DD&end=YYYY-MM-DD de la petición."""
+    return resolve_window(
+        args.get('range', default),
+        start=_parse_date(args.get('start')),
+        end=_parse_date(args.get('end')),
+        today=today,
+    )
@@ -0,0 +1,137 @@
+"""Transacciones con reintento ante deadlocks y esperas de candado.
+
+Con carga concurrente MySQL aborta transacciones con 1213 (deadlock) o 1205
+(lock wait timeout); no son fallas de la operación y repetirla suele
+funcionar. TransactionRunner ejecuta la función dentro de una transacción
+sobre la conexión de get_db(), hace commit y, ante esos errores, hace
+rollback y la repite con espera exponencial con jitter:
+
+    order_id, total = tx.run(place_order, user_id, cart, method, address)
+
+    @tx.transactional
+    def cambiar(cur, oid): ...
+
+La función recibe el cursor y no debe hacer commit ni tener efectos fuera de
+la base de datos, porque puede ejecutarse más de una vez. Un presupuesto de
+reintentos por proceso evita que, si la base de datos está saturada, los
+reintentos multipliquen la carga.
+"""
+import functools
+import os
+import random
+import threading
+import time
+
+import pymysql
+
+RETRYABLE_ERRORS = {
+    1213: 'deadlock',
+    1205: 'lock_wait_timeout',
+}
+
+
+class TransactionConflict(Exception):
+    """La transacción siguió en conflicto después de los reintentos permitidos."""
+
+
+class RetryBudget:
+    """Cubeta de fichas: cada transacción aporta ratio fichas y cada reintento gasta una.
+
+    Así los reintentos no pasan de una fracción de las transacciones, más un
+    margen de min_tokens para ráfagas en procesos con poco tráfico.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = float(min_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+
+class TransactionRunner:
+
+    def __init__(self, get_db, attempts=3, base_delay=0.02, max_delay=0.5, budget=None):
+        self._get_db = get_db
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self._lock = threading.Lock()
+        self.transactions = 0
+        self.retries = {name: 0 for name in RETRYABLE_ERRORS.values()}
+        self.conflicts = 0
+
+    def _backoff(self, attempt):
+        # "Full jitter": espera aleatoria entre 0 y el tope exponencial
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run(self, fn, *args, **kwargs):
+        """Ejecuta fn(cur, *args, **kwargs) en una transacción y devuelve su resultado."""
+        self.budget.deposit()
+        with self._lock:
+            self.transactions += 1
+        attempt = 1
+        while True:
+            conn = self._get_db()
+            try:
+                with conn.cursor() as cur:
+                    result = fn(cur, *args, **kwargs)
+                conn.commit()
+                return result
+            except pymysql.MySQLError as e:
+                conn.rollback()
+                reason = RETRYABLE_ERRORS.get(e.args[0] if e.args else None)
+                if reason is None:
+                    raise
+                if attempt >= self.attempts or not self.budget.withdraw():
+                    with self._lock:
+                        self.conflicts += 1
+                    raise TransactionConflict(
+                        f"Transacción abortada tras {attempt} intentos ({reason})") from e
+                with self._lock:
+                    self.retries[reason] += 1
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+            except Exception:
+                conn.rollback()
+                raise
+
+    def transactional(self, fn):
+        """Decorador: cada llamada a fn(cur, ...) pasa por run()."""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return self.run(fn, *args, **kwargs)
+        return wrapper
+
+    def stats(self):
+        return {
+            'transactions': self.transactions,
+            'retries': dict(self.retries),
+            'conflicts': self.conflicts,
+            'budget_tokens': round(self.budget.tokens, 2),
+        }
+
+
+def runner_from_env(get_db):
+    return TransactionRunner(
+        get_db,
+        attempts=int(os.getenv('TX_RETRY_ATTEMPTS', '3')),
+        base_delay=float(os.getenv('TX_RETRY_BASE_DELAY', '0.02')),
+        max_delay=float(os.getenv('TX_RETRY_MAX_DELAY', '0.5')),
+        budget=RetryBudget(ratio=float(os.getenv('TX_RETRY_BUDGET_RATIO', '0.2'))),
+    )
@@ -21,6 +21,14 @@ ALTER TABLE orders_master
     ADD COLUMN IF NOT EXISTS payment_method VARCHAR(50),
     ADD COLUMN IF NOT EXISTS quantity INT DEFAULT 1;
 
+-- Tabla de sesiones del lado del servidor (SESSION_BACKEND=mysql)
+CREATE TABLE IF NOT EXISTS sessions (
+    id VARCHAR(64) PRIMARY KEY,
+    data MEDIUMTEXT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    INDEX idx_sessions_expires (expires_at)
+);
+
 -- Insertar usuario admin por defecto si no existe
 -- Nota: este INSERT usa contraseña en texto plano SOLO para entornos de desarrollo.
 -- En producción, cambie la contraseña y almacénela hasheada (bcrypt/werkzeug).